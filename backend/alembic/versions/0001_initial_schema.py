@@ -0,0 +1,142 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+document_status = sa.Enum("DRAFT", "PENDING", "SIGNED", "SENT", "ARCHIVED", "REJECTED", name="documentstatus")
+document_type = sa.Enum("CONTRACT", "ACT", "INVOICE", "INVOICE_TAX", "OTHER", name="documenttype")
+user_role = sa.Enum("ADMIN", "DIRECTOR", "ACCOUNTANT", "LAWYER", "VIEWER", name="userrole")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "companies",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False),
+        sa.Column("inn", sa.String(20), nullable=False),
+        sa.Column("ogrn", sa.String(20), nullable=True),
+        sa.Column("kpp", sa.String(20), nullable=True),
+        sa.Column("legal_address", sa.String(500), nullable=True),
+        sa.Column("actual_address", sa.String(500), nullable=True),
+        sa.Column("email", sa.String(255), nullable=True),
+        sa.Column("phone", sa.String(50), nullable=True),
+        sa.Column("website", sa.String(255), nullable=True),
+        sa.Column("logo_path", sa.String(500), nullable=True),
+        sa.Column("stamp_path", sa.String(500), nullable=True),
+        sa.Column("letterhead_path", sa.String(500), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.UniqueConstraint("ogrn"),
+    )
+    op.create_index("ix_companies_id", "companies", ["id"])
+    op.create_index("ix_companies_inn", "companies", ["inn"], unique=True)
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(255), nullable=False),
+        sa.Column("hashed_password", sa.String(255), nullable=False),
+        sa.Column("full_name", sa.String(255), nullable=False),
+        sa.Column("role", user_role, nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "partners",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id"), nullable=False),
+        sa.Column("partner_name", sa.String(255), nullable=False),
+        sa.Column("partner_inn", sa.String(20), nullable=False),
+        sa.Column("partner_email", sa.String(255), nullable=True),
+        sa.Column("partner_phone", sa.String(50), nullable=True),
+        sa.Column("is_connected", sa.Boolean(), nullable=True),
+        sa.Column("invitation_sent_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_partners_id", "partners", ["id"])
+    op.create_index("ix_partners_partner_inn", "partners", ["partner_inn"])
+
+    op.create_table(
+        "documents",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("number", sa.String(100), nullable=False),
+        sa.Column("document_type", document_type, nullable=False),
+        sa.Column("status", document_status, nullable=True),
+        sa.Column("sender_company_id", sa.Integer(), sa.ForeignKey("companies.id"), nullable=False),
+        sa.Column("receiver_company_id", sa.Integer(), sa.ForeignKey("companies.id"), nullable=True),
+        sa.Column("date", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("amount", sa.Numeric(15, 2), nullable=True),
+        sa.Column("currency", sa.String(10), nullable=True),
+        sa.Column("nds", sa.Numeric(15, 2), nullable=True),
+        sa.Column("original_file_path", sa.String(500), nullable=True),
+        sa.Column("signed_file_path", sa.String(500), nullable=True),
+        sa.Column("version", sa.Integer(), nullable=True),
+        sa.Column("parent_document_id", sa.Integer(), sa.ForeignKey("documents.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_documents_id", "documents", ["id"])
+    op.create_index("ix_documents_number", "documents", ["number"])
+
+    op.create_table(
+        "document_versions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("document_id", sa.Integer(), sa.ForeignKey("documents.id"), nullable=False),
+        sa.Column("version_number", sa.Integer(), nullable=False),
+        sa.Column("file_path", sa.String(500), nullable=False),
+        sa.Column("hash", sa.String(64), nullable=True),
+        sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_document_versions_id", "document_versions", ["id"])
+
+    op.create_table(
+        "signatures",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("document_id", sa.Integer(), sa.ForeignKey("documents.id"), nullable=False),
+        sa.Column("signer_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("certificate_serial", sa.String(255), nullable=True),
+        sa.Column("signature_hash", sa.String(64), nullable=True),
+        sa.Column("signature_data", sa.Text(), nullable=True),
+        sa.Column("is_valid", sa.Boolean(), nullable=True),
+        sa.Column("signed_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_signatures_id", "signatures", ["id"])
+
+    op.create_table(
+        "comments",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("document_id", sa.Integer(), sa.ForeignKey("documents.id"), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("text", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_comments_id", "comments", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("comments")
+    op.drop_table("signatures")
+    op.drop_table("document_versions")
+    op.drop_table("documents")
+    op.drop_table("partners")
+    op.drop_table("users")
+    op.drop_table("companies")
+    user_role.drop(op.get_bind(), checkfirst=True)
+    document_type.drop(op.get_bind(), checkfirst=True)
+    document_status.drop(op.get_bind(), checkfirst=True)
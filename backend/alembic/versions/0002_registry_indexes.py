@@ -0,0 +1,45 @@
+"""registry composite indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Реестр исходящих документов: tenant + фильтр + сортировка по (created_at, id)
+    op.create_index("ix_documents_sender_created", "documents", ["sender_company_id", "created_at", "id"])
+    op.create_index(
+        "ix_documents_sender_status_created", "documents",
+        ["sender_company_id", "status", "created_at", "id"],
+    )
+    op.create_index(
+        "ix_documents_sender_type_created", "documents",
+        ["sender_company_id", "document_type", "created_at", "id"],
+    )
+    # Входящие документы: частичный индекс только по строкам с получателем
+    op.create_index(
+        "ix_documents_receiver_created", "documents",
+        ["receiver_company_id", "created_at", "id"],
+        postgresql_where=sa.text("receiver_company_id IS NOT NULL"),
+    )
+    op.create_index("ix_signatures_document_signed", "signatures", ["document_id", "signed_at"])
+    op.create_index("ix_document_versions_document", "document_versions", ["document_id", "version_number"])
+    op.create_index("ix_partners_company_created", "partners", ["company_id", "created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_partners_company_created", table_name="partners")
+    op.drop_index("ix_document_versions_document", table_name="document_versions")
+    op.drop_index("ix_signatures_document_signed", table_name="signatures")
+    op.drop_index("ix_documents_receiver_created", table_name="documents")
+    op.drop_index("ix_documents_sender_type_created", table_name="documents")
+    op.drop_index("ix_documents_sender_status_created", table_name="documents")
+    op.drop_index("ix_documents_sender_created", table_name="documents")
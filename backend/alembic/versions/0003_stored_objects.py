@@ -0,0 +1,33 @@
+"""content-addressed stored objects
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "stored_objects",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id"), nullable=False),
+        sa.Column("hash", sa.String(64), nullable=False),
+        sa.Column("path", sa.String(500), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column("content_type", sa.String(255), nullable=True),
+        sa.Column("ref_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint("company_id", "hash", name="uq_stored_objects_company_hash"),
+    )
+    op.create_index("ix_stored_objects_id", "stored_objects", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("stored_objects")
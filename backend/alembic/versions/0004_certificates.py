@@ -0,0 +1,32 @@
+"""signer certificates
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "certificates",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("serial", sa.String(255), nullable=False),
+        sa.Column("subject", sa.String(1000), nullable=True),
+        sa.Column("certificate_pem", sa.Text(), nullable=False),
+        sa.Column("not_valid_before", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("not_valid_after", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_certificates_id", "certificates", ["id"])
+    op.create_index("ix_certificates_serial", "certificates", ["serial"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_table("certificates")
@@ -0,0 +1,53 @@
+"""background processing jobs
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+job_status = sa.Enum("PENDING", "RUNNING", "COMPLETED", "FAILED", name="jobstatus")
+
+
+def upgrade() -> None:
+    op.add_column("stored_objects", sa.Column("page_count", sa.Integer(), nullable=True))
+    op.add_column("stored_objects", sa.Column("extracted_text", sa.Text(), nullable=True))
+    op.add_column("stored_objects", sa.Column("preview_path", sa.String(500), nullable=True))
+    op.add_column("stored_objects", sa.Column("scan_status", sa.String(20), nullable=True))
+    op.add_column("stored_objects", sa.Column("processed_at", sa.DateTime(timezone=True), nullable=True))
+
+    op.create_table(
+        "processing_jobs",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id"), nullable=False),
+        sa.Column(
+            "stored_object_id", sa.Integer(),
+            sa.ForeignKey("stored_objects.id", ondelete="CASCADE"), nullable=False,
+        ),
+        sa.Column(
+            "document_id", sa.Integer(),
+            sa.ForeignKey("documents.id", ondelete="SET NULL"), nullable=True,
+        ),
+        sa.Column("status", job_status, nullable=False),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_processing_jobs_company_id", "processing_jobs", ["company_id"])
+
+
+def downgrade() -> None:
+    op.drop_table("processing_jobs")
+    job_status.drop(op.get_bind(), checkfirst=True)
+    op.drop_column("stored_objects", "processed_at")
+    op.drop_column("stored_objects", "scan_status")
+    op.drop_column("stored_objects", "preview_path")
+    op.drop_column("stored_objects", "extracted_text")
+    op.drop_column("stored_objects", "page_count")
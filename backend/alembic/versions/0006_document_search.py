@@ -0,0 +1,34 @@
+"""document full-text search
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+from app.search import rebuild_document_search
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+    op.add_column("documents", sa.Column("search_vector", TSVECTOR(), nullable=True))
+    # Заполнение существующих документов тем же запросом и SEARCH_CONFIG,
+    # что и при обновлении документов (app/search.py)
+    rebuild_document_search(op.get_bind())
+    op.create_index(
+        "ix_documents_sender_search", "documents",
+        ["sender_company_id", "search_vector"],
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_documents_sender_search", table_name="documents")
+    op.drop_column("documents", "search_vector")
@@ -0,0 +1,40 @@
+"""partner trigram search
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+    op.create_index(
+        "ix_partners_company_name_trgm", "partners",
+        ["company_id", "partner_name"],
+        postgresql_using="gin",
+        postgresql_ops={"partner_name": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_partners_company_inn_trgm", "partners",
+        ["company_id", "partner_inn"],
+        postgresql_using="gin",
+        postgresql_ops={"partner_inn": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_partners_company_inn_prefix", "partners",
+        ["company_id", "partner_inn"],
+        postgresql_ops={"partner_inn": "varchar_pattern_ops"},
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_partners_company_inn_prefix", table_name="partners")
+    op.drop_index("ix_partners_company_inn_trgm", table_name="partners")
+    op.drop_index("ix_partners_company_name_trgm", table_name="partners")
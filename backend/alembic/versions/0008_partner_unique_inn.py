@@ -0,0 +1,22 @@
+"""unique partner inn per company
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # create_partner не допускал дублей ИНН; если они всё же есть,
+    # миграция упадёт и дубли нужно разрешить вручную
+    op.create_unique_constraint("uq_partners_company_inn", "partners", ["company_id", "partner_inn"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_partners_company_inn", "partners", type_="unique")
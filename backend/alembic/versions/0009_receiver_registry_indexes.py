@@ -0,0 +1,32 @@
+"""receiver-side registry indexes
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Фильтры входящего реестра, симметрично исходящему (0002)
+    op.create_index(
+        "ix_documents_receiver_status_created", "documents",
+        ["receiver_company_id", "status", "created_at", "id"],
+        postgresql_where=sa.text("receiver_company_id IS NOT NULL"),
+    )
+    op.create_index(
+        "ix_documents_receiver_type_created", "documents",
+        ["receiver_company_id", "document_type", "created_at", "id"],
+        postgresql_where=sa.text("receiver_company_id IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_documents_receiver_type_created", table_name="documents")
+    op.drop_index("ix_documents_receiver_status_created", table_name="documents")
@@ -0,0 +1,44 @@
+"""incrementally maintained document registry counters
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.stats import STATS_FUNCTIONS_DDL, STATS_TRIGGER_DDL, rebuild_document_stats
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+document_status = postgresql.ENUM(name="documentstatus", create_type=False)
+document_type = postgresql.ENUM(name="documenttype", create_type=False)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "document_stats",
+        sa.Column("company_id", sa.Integer(), sa.ForeignKey("companies.id"), primary_key=True),
+        sa.Column("direction", sa.String(10), primary_key=True),
+        sa.Column("status", document_status, primary_key=True),
+        sa.Column("document_type", document_type, primary_key=True),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.Numeric(18, 2), nullable=False),
+        sa.Column("nds", sa.Numeric(18, 2), nullable=False),
+    )
+    op.execute(STATS_FUNCTIONS_DDL)
+    op.execute(STATS_TRIGGER_DDL)
+    # Начальное заполнение по существующим документам
+    rebuild_document_stats(op.get_bind())
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS documents_stats ON documents")
+    op.execute("DROP FUNCTION IF EXISTS documents_stats_trigger()")
+    op.execute(
+        "DROP FUNCTION IF EXISTS document_stats_bump(integer, varchar, documentstatus, documenttype, integer, numeric, numeric)"
+    )
+    op.drop_table("document_stats")
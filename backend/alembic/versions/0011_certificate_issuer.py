@@ -0,0 +1,48 @@
+"""certificates keyed by issuer and serial
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from cryptography import x509
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("certificates", sa.Column("issuer", sa.String(1000), nullable=True))
+    op.add_column("signatures", sa.Column("certificate_issuer", sa.String(1000), nullable=True))
+
+    # Издатель берётся из сохранённого PEM
+    bind = op.get_bind()
+    certificates = bind.execute(sa.text("SELECT id, certificate_pem FROM certificates")).all()
+    for certificate_id, pem in certificates:
+        issuer = x509.load_pem_x509_certificate(pem.encode()).issuer.rfc4514_string()
+        bind.execute(
+            sa.text("UPDATE certificates SET issuer = :issuer WHERE id = :id"),
+            {"issuer": issuer, "id": certificate_id},
+        )
+    # До этой миграции серийный номер был уникален, поэтому подписи сопоставляются по нему
+    op.execute(
+        "UPDATE signatures SET certificate_issuer = certificates.issuer "
+        "FROM certificates WHERE certificates.serial = signatures.certificate_serial"
+    )
+
+    op.alter_column("certificates", "issuer", nullable=False)
+    op.drop_index("ix_certificates_serial", table_name="certificates")
+    op.create_index("ix_certificates_serial", "certificates", ["serial"])
+    op.create_unique_constraint("uq_certificates_issuer_serial", "certificates", ["issuer", "serial"])
+
+
+def downgrade() -> None:
+    # Сертификаты разных УЦ с одинаковым серийным номером не дают создать уникальный индекс
+    op.drop_constraint("uq_certificates_issuer_serial", "certificates", type_="unique")
+    op.drop_index("ix_certificates_serial", table_name="certificates")
+    op.create_index("ix_certificates_serial", "certificates", ["serial"], unique=True)
+    op.drop_column("signatures", "certificate_issuer")
+    op.drop_column("certificates", "issuer")
@@ -0,0 +1,36 @@
+"""upload file names and orphaned stored object lookup
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("stored_objects", sa.Column("original_filename", sa.String(255), nullable=True))
+    op.add_column("document_versions", sa.Column("original_filename", sa.String(255), nullable=True))
+    # Имя файла при скачивании ищется по пути
+    op.create_index("ix_document_versions_file_path", "document_versions", ["file_path"])
+    op.create_index("ix_stored_objects_company_path", "stored_objects", ["company_id", "path"])
+    # Поиск объектов без ссылок для очистки (app.tasks.cleanup_orphaned_objects)
+    op.create_index(
+        "ix_stored_objects_orphaned",
+        "stored_objects",
+        ["created_at"],
+        postgresql_where=sa.text("ref_count <= 0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_stored_objects_orphaned", table_name="stored_objects")
+    op.drop_index("ix_stored_objects_company_path", table_name="stored_objects")
+    op.drop_index("ix_document_versions_file_path", table_name="document_versions")
+    op.drop_column("document_versions", "original_filename")
+    op.drop_column("stored_objects", "original_filename")
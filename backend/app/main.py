@@ -1,23 +1,39 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import os
 from dotenv import load_dotenv
 
-from app.database import engine, Base
-from app.routers import auth, companies, documents, partners, files, signature
+from app.database import pool_status
+from app.pagination import NEXT_CURSOR_HEADER
+from app.serialization import DefaultResponse
+from app.compression import CompressionMiddleware
+from app.response_cache import InvalidationMiddleware
+from app.metrics import MetricsMiddleware, render_metrics
+from app.profiling import SQL_PROFILING, PROFILE_HEADER, SQLProfilingMiddleware, recent_profiles
+from app.routers import auth, companies, documents, partners, files, signature, jobs
 
 load_dotenv()
 
-# Создаём таблицы при запуске (в продакшене использовать миграции)
-Base.metadata.create_all(bind=engine)
+# Схема БД создаётся только миграциями: alembic upgrade head (см. README)
 
 app = FastAPI(
     title="ЭДО Система API",
     description="API для системы электронного документооборота",
     version="1.0.0",
+    default_response_class=DefaultResponse,
 )
 
+# Ответ уходит после сброса кэшей, запущенного commit запроса
+app.add_middleware(InvalidationMiddleware)
+# Сжатие ответов gzip/brotli (порог COMPRESSION_MIN_SIZE)
+app.add_middleware(CompressionMiddleware)
+# Профиль SQL по запросам (только при SQL_PROFILING=true, для разработки)
+if SQL_PROFILING:
+    app.add_middleware(SQLProfilingMiddleware)
+# Метрики Prometheus: латентность по маршрутам, SQL на запрос (GET /metrics)
+app.add_middleware(MetricsMiddleware)
+
 # CORS
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
 app.add_middleware(
@@ -26,6 +42,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "Content-Range", "Accept-Ranges", "ETag", PROFILE_HEADER],
 )
 
 # Роутеры
@@ -35,6 +52,7 @@ app.include_router(documents.router, prefix="/api/documents", tags=["documents"]
 app.include_router(partners.router, prefix="/api/partners", tags=["partners"])
 app.include_router(files.router, prefix="/api/files", tags=["files"])
 app.include_router(signature.router, prefix="/api/signature", tags=["signature"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
 
 
 @app.get("/")
@@ -51,6 +69,25 @@ async def health():
     return JSONResponse({"status": "healthy"})
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+if SQL_PROFILING:
+    @app.get("/debug/sql", include_in_schema=False)
+    async def debug_sql(limit: int = 20):
+        """Последние профили SQL (новые первыми)"""
+        return list(reversed(recent_profiles))[:limit]
+
+
+@app.get("/health/pool")
+async def health_pool():
+    """Состояние пулов соединений с БД этого процесса"""
+    return pool_status()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,183 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from dotenv import load_dotenv
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.database import async_engine, engine, pool_status
+
+load_dotenv()
+
+# Несколько воркеров uvicorn: метрики собираются через каталог prometheus_client
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ["method", "router", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Запросы в обработке",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+REQUEST_SQL_QUERIES = Histogram(
+    "http_request_sql_queries",
+    "Количество SQL-запросов на HTTP-запрос",
+    ["router", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 200),
+)
+REQUEST_SQL_SECONDS = Histogram(
+    "http_request_sql_duration_seconds",
+    "Суммарное время SQL на HTTP-запрос",
+    ["router", "route"],
+)
+MINIO_LATENCY = Histogram(
+    "minio_operation_duration_seconds",
+    "Время операций MinIO (get - до первого байта)",
+    ["operation"],
+)
+MINIO_BYTES = Counter(
+    "minio_bytes_total",
+    "Байты, переданные в MinIO и из MinIO",
+    ["operation"],
+)
+SIGNATURE_LATENCY = Histogram(
+    "signature_operation_duration_seconds",
+    "Время операций ЭЦП: pkcs12_load, sign, verify",
+    ["operation"],
+)
+
+
+class _RequestSql:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+# Счётчик SQL текущего запроса; объект общий для задач и гринлетов запроса
+_request_sql: ContextVar[Optional[_RequestSql]] = ContextVar("request_sql", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_sql.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - context.metrics_started
+
+
+for _engine in (engine, async_engine.sync_engine):
+    event.listen(_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def observe(histogram: Histogram, operation: str):
+    """Замер длительности операции в гистограмме с меткой operation"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(operation=operation).observe(time.perf_counter() - started)
+
+
+def _route_labels(scope: Scope):
+    # FastAPI кладёт сработавший маршрут в scope; шаблон пути ограничивает кардинальность
+    route = scope.get("route")
+    if route is None:
+        return "none", "unmatched"
+    tags = getattr(route, "tags", None)
+    return (tags[0] if tags else "root"), route.path
+
+
+class MetricsMiddleware:
+    """Латентность по маршрутам, запросы в обработке и SQL на запрос"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        sql = _RequestSql()
+        token = _request_sql.set(sql)
+        in_flight = REQUESTS_IN_FLIGHT.labels(method=method)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight.dec()
+            _request_sql.reset(token)
+            router, route = _route_labels(scope)
+            REQUEST_LATENCY.labels(
+                method=method, router=router, route=route, status=str(status_code)
+            ).observe(elapsed)
+            REQUEST_SQL_QUERIES.labels(router=router, route=route).observe(sql.count)
+            REQUEST_SQL_SECONDS.labels(router=router, route=route).observe(sql.seconds)
+
+
+class _PoolCollector:
+    """Состояние пулов соединений (app.database.pool_status) на момент сбора"""
+
+    def collect(self):
+        checked_out = GaugeMetricFamily("db_pool_checked_out", "Занятые соединения пула", labels=["engine"])
+        size = GaugeMetricFamily("db_pool_size", "Размер пула", labels=["engine"])
+        wait = GaugeMetricFamily("db_pool_wait_seconds_total", "Суммарное ожидание соединения", labels=["engine"])
+        timeouts = GaugeMetricFamily("db_pool_timeouts_total", "Таймауты получения соединения", labels=["engine"])
+        for name, status in pool_status().items():
+            checked_out.add_metric([name], status.get("checked_out", 0))
+            size.add_metric([name], status.get("size", 0))
+            wait.add_metric([name], status["wait_seconds_total"])
+            timeouts.add_metric([name], status["timeouts"])
+        yield from (checked_out, size, wait, timeouts)
+
+
+def render_metrics():
+    """Текст метрик в формате Prometheus и его content-type"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        # Пулы - состояние текущего процесса, в агрегат воркеров не входят
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+if not PROMETHEUS_MULTIPROC_DIR:
+    from prometheus_client import REGISTRY
+
+    REGISTRY.register(_PoolCollector())
@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Numeric, Enum as SQLEnum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Text, Boolean, Numeric, Index, UniqueConstraint, JSON, Enum as SQLEnum
+from sqlalchemy import DDL, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from datetime import datetime
 import enum
 
 from app.database import Base
+from app.stats import STATS_FUNCTIONS_DDL, STATS_TRIGGER_DDL
 
 
 class DocumentStatus(str, enum.Enum):
@@ -24,6 +27,12 @@ class DocumentType(str, enum.Enum):
     OTHER = "other"
 
 
+class DocumentDirection(str, enum.Enum):
+    OUTGOING = "outgoing"
+    INCOMING = "incoming"
+    ALL = "all"
+
+
 class UserRole(str, enum.Enum):
     ADMIN = "admin"
     DIRECTOR = "director"
@@ -97,6 +106,32 @@ class Partner(Base):
 
     company = relationship("Company")
 
+    __table_args__ = (
+        # Реестр контрагентов компании
+        Index("ix_partners_company_created", "company_id", "created_at", "id"),
+        # Поиск по подстроке наименования и ИНН (pg_trgm + btree_gin)
+        Index(
+            "ix_partners_company_name_trgm",
+            "company_id", "partner_name",
+            postgresql_using="gin",
+            postgresql_ops={"partner_name": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_partners_company_inn_trgm",
+            "company_id", "partner_inn",
+            postgresql_using="gin",
+            postgresql_ops={"partner_inn": "gin_trgm_ops"},
+        ),
+        # Один контрагент на ИНН в пределах компании (ключ upsert при импорте)
+        UniqueConstraint("company_id", "partner_inn", name="uq_partners_company_inn"),
+        # Быстрый поиск по префиксу ИНН
+        Index(
+            "ix_partners_company_inn_prefix",
+            "company_id", "partner_inn",
+            postgresql_ops={"partner_inn": "varchar_pattern_ops"},
+        ),
+    )
+
 
 class Document(Base):
     __tablename__ = "documents"
@@ -123,6 +158,10 @@ class Document(Base):
     version = Column(Integer, default=1)
     parent_document_id = Column(Integer, ForeignKey("documents.id"), nullable=True)
     
+    # Полнотекстовый поиск: номер, контрагент, текст файла (app/search.py).
+    # Отложенная загрузка: реестр и карточки не читают tsvector
+    search_vector = deferred(Column(TSVECTOR, nullable=True))
+    
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -132,6 +171,35 @@ class Document(Base):
     versions = relationship("DocumentVersion", back_populates="document")
     comments = relationship("Comment", back_populates="document")
 
+    __table_args__ = (
+        # Реестр исходящих документов компании и его фильтры
+        Index("ix_documents_sender_created", "sender_company_id", "created_at", "id"),
+        Index("ix_documents_sender_status_created", "sender_company_id", "status", "created_at", "id"),
+        Index("ix_documents_sender_type_created", "sender_company_id", "document_type", "created_at", "id"),
+        # Входящие документы (только строки с получателем)
+        Index(
+            "ix_documents_receiver_created",
+            "receiver_company_id", "created_at", "id",
+            postgresql_where=receiver_company_id.isnot(None),
+        ),
+        Index(
+            "ix_documents_receiver_status_created",
+            "receiver_company_id", "status", "created_at", "id",
+            postgresql_where=receiver_company_id.isnot(None),
+        ),
+        Index(
+            "ix_documents_receiver_type_created",
+            "receiver_company_id", "document_type", "created_at", "id",
+            postgresql_where=receiver_company_id.isnot(None),
+        ),
+        # Поиск в пределах компании (составной GIN требует btree_gin)
+        Index(
+            "ix_documents_sender_search",
+            "sender_company_id", "search_vector",
+            postgresql_using="gin",
+        ),
+    )
+
 
 class DocumentVersion(Base):
     __tablename__ = "document_versions"
@@ -140,12 +208,103 @@ class DocumentVersion(Base):
     document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
     version_number = Column(Integer, nullable=False)
     file_path = Column(String(500), nullable=False)
+    original_filename = Column(String(255), nullable=True)  # имя файла при загрузке
     hash = Column(String(64), nullable=True)  # SHA-256 hash
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     document = relationship("Document", back_populates="versions")
 
+    __table_args__ = (
+        Index("ix_document_versions_document", "document_id", "version_number"),
+        Index("ix_document_versions_file_path", "file_path"),
+    )
+
+
+class DocumentStat(Base):
+    """Счётчики реестра компании по направлению, статусу и типу (app/stats.py)"""
+    __tablename__ = "document_stats"
+
+    company_id = Column(Integer, ForeignKey("companies.id"), primary_key=True)
+    direction = Column(String(10), primary_key=True)  # outgoing / incoming
+    status = Column(SQLEnum(DocumentStatus), primary_key=True)
+    document_type = Column(SQLEnum(DocumentType), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    amount = Column(Numeric(18, 2), nullable=False, default=0)
+    nds = Column(Numeric(18, 2), nullable=False, default=0)
+
+
+class StoredObject(Base):
+    """Файл в хранилище, адресуемый по SHA-256 содержимого (в пределах компании)"""
+    __tablename__ = "stored_objects"
+
+    id = Column(Integer, primary_key=True, index=True)
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False)
+    hash = Column(String(64), nullable=False)  # SHA-256 hash
+    path = Column(String(500), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String(255), nullable=True)
+    # Имя файла при первой загрузке содержимого
+    original_filename = Column(String(255), nullable=True)
+    # Количество ссылок из DocumentVersion
+    ref_count = Column(Integer, nullable=False, default=0)
+
+    # Результаты фоновой обработки (app/tasks.py)
+    page_count = Column(Integer, nullable=True)
+    extracted_text = deferred(Column(Text, nullable=True))  # до MAX_EXTRACTED_TEXT, отложенная загрузка
+    preview_path = Column(String(500), nullable=True)
+    scan_status = Column(String(20), nullable=True)  # clean / infected / skipped
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("company_id", "hash", name="uq_stored_objects_company_hash"),
+        Index("ix_stored_objects_company_path", "company_id", "path"),
+        # Объекты без ссылок для очистки (app.tasks.cleanup_orphaned_objects)
+        Index("ix_stored_objects_orphaned", "created_at", postgresql_where=ref_count <= 0),
+    )
+
+
+class JobStatus(str, enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class ProcessingJob(Base):
+    """Фоновая задача обработки загруженного файла"""
+    __tablename__ = "processing_jobs"
+
+    id = Column(String(36), primary_key=True)  # совпадает с id задачи Celery
+    company_id = Column(Integer, ForeignKey("companies.id"), nullable=False, index=True)
+    stored_object_id = Column(Integer, ForeignKey("stored_objects.id", ondelete="CASCADE"), nullable=False)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="SET NULL"), nullable=True)
+    status = Column(SQLEnum(JobStatus), nullable=False, default=JobStatus.PENDING)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class Certificate(Base):
+    """Сертификат подписанта (открытая часть), по издателю и серийному номеру"""
+    __tablename__ = "certificates"
+    # Серийный номер уникален только в пределах УЦ-издателя
+    __table_args__ = (
+        UniqueConstraint("issuer", "serial", name="uq_certificates_issuer_serial"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    issuer = Column(String(1000), nullable=False)
+    serial = Column(String(255), nullable=False, index=True)
+    subject = Column(String(1000), nullable=True)
+    certificate_pem = Column(Text, nullable=False)
+    not_valid_before = Column(DateTime(timezone=True), nullable=True)
+    not_valid_after = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
 
 class Signature(Base):
     __tablename__ = "signatures"
@@ -155,6 +314,7 @@ class Signature(Base):
     signer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     
     # Данные подписи
+    certificate_issuer = Column(String(1000), nullable=True)
     certificate_serial = Column(String(255), nullable=True)
     signature_hash = Column(String(64), nullable=True)
     signature_data = Column(Text, nullable=True)  # Base64 подпись
@@ -165,6 +325,10 @@ class Signature(Base):
     document = relationship("Document", back_populates="signatures")
     signer = relationship("User", back_populates="signatures")
 
+    __table_args__ = (
+        Index("ix_signatures_document_signed", "document_id", "signed_at"),
+    )
+
 
 class Comment(Base):
     __tablename__ = "comments"
@@ -176,6 +340,12 @@ class Comment(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     document = relationship("Document", back_populates="comments")
+    user = relationship("User")
 
 
-
+# Расширения для GIN-индексов при создании схемы через create_all
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS btree_gin"))
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+# Триггер счётчиков реестра (document_stats)
+event.listen(Base.metadata, "after_create", DDL(STATS_FUNCTIONS_DDL))
+event.listen(Base.metadata, "after_create", DDL(STATS_TRIGGER_DDL))
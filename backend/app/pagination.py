@@ -0,0 +1,103 @@
+import base64
+import json
+from datetime import datetime
+from typing import Iterable, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import select, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+# Заголовок, в котором возвращается курсор следующей страницы
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Кодирование непрозрачного курсора по ключу (created_at, id)"""
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Декодирование курсора; 400 при повреждённом значении"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+
+def _keyset_condition(model, cursor: Optional[str]):
+    if not cursor:
+        return None
+    created_at, row_id = decode_cursor(cursor)
+    return tuple_(model.created_at, model.id) < tuple_(created_at, row_id)
+
+
+def _finish_page(rows: Sequence, limit: int, response: Response) -> Sequence:
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
+    return rows
+
+
+async def paginate(
+    db: AsyncSession,
+    query: Select,
+    model,
+    response: Response,
+    limit: int,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+) -> Sequence:
+    """Постраничная выборка, упорядоченная по (created_at, id) desc.
+
+    С курсором используется keyset-пагинация: страница N стоит столько же,
+    сколько первая. Без курсора работает совместимый режим skip/limit.
+    Если есть следующая страница, её курсор отдаётся в X-Next-Cursor.
+    """
+    keyset = _keyset_condition(model, cursor)
+    if keyset is not None:
+        query = query.where(keyset)
+    elif skip:
+        query = query.offset(skip)
+
+    query = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+    result = await db.execute(query)
+    return _finish_page(result.scalars().all(), limit, response)
+
+
+async def paginate_merged(
+    db: AsyncSession,
+    model,
+    branches: Iterable[Sequence],
+    response: Response,
+    limit: int,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    options: Sequence = (),
+) -> Sequence:
+    """То же, что paginate, но по объединению непересекающихся условий.
+
+    Каждая ветка отдельно читает не больше страницы по своему индексу
+    (created_at, id), ветки сливаются одним запросом через UNION ALL.
+    """
+    keyset = _keyset_condition(model, cursor)
+    depth = limit + 1 + (skip if keyset is None else 0)
+    subqueries = []
+    for conditions in branches:
+        branch = select(model.id, model.created_at).where(*conditions)
+        if keyset is not None:
+            branch = branch.where(keyset)
+        branch = branch.order_by(model.created_at.desc(), model.id.desc()).limit(depth)
+        subqueries.append(select(branch.subquery()))
+    merged = union_all(*subqueries).subquery()
+
+    query = select(model).join(merged, model.id == merged.c.id).options(*options)
+    if keyset is None and skip:
+        query = query.offset(skip)
+    query = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+    result = await db.execute(query)
+    return _finish_page(result.scalars().all(), limit, response)
@@ -0,0 +1,107 @@
+import codecs
+import csv
+import io
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Сопоставление заголовков файла (в т.ч. выгрузки 1С) полям контрагента
+HEADER_ALIASES = {
+    "partner_name": "partner_name",
+    "name": "partner_name",
+    "наименование": "partner_name",
+    "контрагент": "partner_name",
+    "partner_inn": "partner_inn",
+    "inn": "partner_inn",
+    "инн": "partner_inn",
+    "partner_email": "partner_email",
+    "email": "partner_email",
+    "e-mail": "partner_email",
+    "эл. почта": "partner_email",
+    "электронная почта": "partner_email",
+    "partner_phone": "partner_phone",
+    "phone": "partner_phone",
+    "телефон": "partner_phone",
+}
+
+# Кодировки, в которых обычно приходят CSV (UTF-8 и выгрузки 1С)
+CSV_ENCODINGS = ("utf-8-sig", "cp1251")
+
+
+def _map_header(header: List) -> List[Optional[str]]:
+    return [HEADER_ALIASES.get(str(cell or "").strip().lower()) for cell in header]
+
+
+def _detect_encoding(fileobj) -> str:
+    # Образец может обрываться посреди многобайтового символа, поэтому
+    # декодируется инкрементально (final=False): хвост не считается ошибкой
+    sample = fileobj.read(64 * 1024)
+    fileobj.seek(0)
+    for encoding in CSV_ENCODINGS:
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return CSV_ENCODINGS[0]
+
+
+def iter_csv_rows(fileobj) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Построчное чтение CSV без загрузки файла в память"""
+    encoding = _detect_encoding(fileobj)
+    text = io.TextIOWrapper(fileobj, encoding=encoding, errors="replace", newline="")
+    sample = text.read(8192)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(text, dialect)
+    header = next(reader, None)
+    if header is None:
+        return
+    fields = _map_header(header)
+    for line_number, row in enumerate(reader, start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        yield line_number, {
+            field: value.strip()
+            for field, value in zip(fields, row)
+            if field
+        }
+
+
+def iter_xlsx_rows(fileobj) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Построчное чтение первого листа XLSX в режиме read_only"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        fields = _map_header(list(header))
+        for line_number, row in enumerate(rows, start=2):
+            if not any(cell not in (None, "") for cell in row):
+                continue
+            yield line_number, {
+                field: _cell_to_str(value)
+                for field, value in zip(fields, row)
+                if field
+            }
+    finally:
+        workbook.close()
+
+
+def _cell_to_str(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        # ИНН в Excel часто хранится числом
+        return str(int(value))
+    return str(value).strip()
+
+
+def take(rows: Iterator, size: int) -> list:
+    """Следующая пачка строк из итератора"""
+    return list(islice(rows, size))
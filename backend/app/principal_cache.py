@@ -0,0 +1,109 @@
+import os
+from datetime import datetime
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.models import User
+from app.response_cache import MemoryResponseCache, NullResponseCache, RedisResponseCache
+
+load_dotenv()
+
+# Кэш аутентифицированных пользователей: memory | redis | none. По умолчанию redis,
+# если задан REDIS_URL: memory сбрасывается только в своём процессе, и на других
+# воркерах деактивированный пользователь сохранял бы доступ до PRINCIPAL_CACHE_TTL
+PRINCIPAL_CACHE_BACKEND = os.getenv(
+    "PRINCIPAL_CACHE_BACKEND", "redis" if os.getenv("REDIS_URL") else "none"
+).lower()
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_MAXSIZE = int(os.getenv("PRINCIPAL_CACHE_MAXSIZE", "10000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Поля пользователя, изменение которых сбрасывает кэш
+_INVALIDATING_FIELDS = ("is_active", "role", "company_id", "email", "full_name", "hashed_password")
+
+
+def to_principal(user: User) -> dict:
+    """Сериализация пользователя в запись кэша"""
+    role = user.role.value if hasattr(user.role, "value") else user.role
+    return {
+        "id": user.id,
+        "email": user.email,
+        "full_name": user.full_name,
+        "role": role,
+        "company_id": user.company_id,
+        "is_active": user.is_active,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+    }
+
+
+def principal_user(principal: dict) -> User:
+    """Восстановление пользователя (вне сессии) из записи кэша"""
+    data = dict(principal)
+    if data.get("created_at"):
+        data["created_at"] = datetime.fromisoformat(data["created_at"])
+    return User(**data)
+
+
+def principal_key(user_id: int) -> str:
+    return f"principal:{user_id}"
+
+
+# Кэш устроен как кэш ответов (app/response_cache.py): у ключа пользователя
+# есть поколение, и запись, прочитанная из БД до сброса, в кэш не попадает
+_VARIANT = "principal"
+
+
+def _create_cache():
+    if PRINCIPAL_CACHE_BACKEND == "redis":
+        return RedisResponseCache(REDIS_URL, PRINCIPAL_CACHE_TTL)
+    if PRINCIPAL_CACHE_BACKEND == "memory":
+        return MemoryResponseCache(PRINCIPAL_CACHE_TTL, PRINCIPAL_CACHE_MAXSIZE)
+    return NullResponseCache()
+
+
+principal_cache = _create_cache()
+
+
+async def cached_principal(user_id: int) -> Tuple[Optional[dict], int]:
+    """Запись кэша и поколение ключа на момент чтения"""
+    return await principal_cache.get(principal_key(user_id), _VARIANT)
+
+
+async def store_principal(user_id: int, principal: dict, generation: int) -> None:
+    """Запись в кэш, если пользователь не изменялся после cached_principal"""
+    await principal_cache.set(principal_key(user_id), _VARIANT, principal, generation)
+
+
+async def invalidate_principal(user_id: int) -> None:
+    """Явный сброс кэша пользователя"""
+    await principal_cache.delete([principal_key(user_id)])
+
+
+# Автоматический сброс: изменения пользователя собираются при flush
+# и применяются к кэшу только после успешного commit
+@event.listens_for(Session, "before_flush")
+def _collect_changed_users(session, flush_context, instances):
+    changed = session.info.setdefault("invalidated_principals", set())
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            state = inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in _INVALIDATING_FIELDS):
+                changed.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changed.add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    user_ids = session.info.pop("invalidated_principals", None)
+    if user_ids:
+        principal_cache.delete_nowait([principal_key(user_id) for user_id in user_ids])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session):
+    session.info.pop("invalidated_principals", None)
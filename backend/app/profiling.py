@@ -0,0 +1,145 @@
+import os
+import re
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Deque, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.database import async_engine, engine
+
+load_dotenv()
+
+# Профилирование SQL по запросам (для разработки и стендов)
+SQL_PROFILING = os.getenv("SQL_PROFILING", "false").lower() == "true"
+# Порог медленного запроса, мс
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+# Сколько одинаковых по форме запросов в одном HTTP-запросе считается N+1
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+# Сколько последних профилей хранит GET /debug/sql
+SQL_PROFILE_HISTORY = int(os.getenv("SQL_PROFILE_HISTORY", "100"))
+
+PROFILE_HEADER = "X-SQL-Profile"
+
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|%s|\?")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:::\w+)?(?:\s*,\s*\?(?:::\w+)?)*\s*\)")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Форма запроса: параметры и литералы заменены на ?, списки IN свёрнуты"""
+    shape = _PLACEHOLDER.sub("?", statement)
+    shape = _LITERAL.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(?)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class RequestProfile:
+    """SQL одного HTTP-запроса"""
+
+    def __init__(self, scope: Scope):
+        self.scope = scope
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.statements: List[dict] = []
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return route.path if route is not None else self.path
+
+    @property
+    def total_ms(self) -> float:
+        return sum(item["duration_ms"] for item in self.statements)
+
+    def repeated(self) -> List[dict]:
+        """Формы запросов, повторённые не меньше порога N+1"""
+        counts = Counter(item["shape"] for item in self.statements)
+        return [
+            {"shape": shape, "count": count}
+            for shape, count in counts.most_common()
+            if count >= SQL_N_PLUS_ONE_THRESHOLD
+        ]
+
+    def summary(self) -> str:
+        return f"count={len(self.statements)}; time_ms={self.total_ms:.1f}; repeated={len(self.repeated())}"
+
+    def to_dict(self) -> dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "count": len(self.statements),
+            "total_ms": round(self.total_ms, 3),
+            "n_plus_one": self.repeated(),
+            "statements": self.statements,
+        }
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("sql_profile", default=None)
+recent_profiles: Deque[dict] = deque(maxlen=SQL_PROFILE_HISTORY)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.profiling_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    if profile is None:
+        return
+    duration_ms = (time.perf_counter() - context.profiling_started) * 1000
+    profile.statements.append({
+        "statement": statement,
+        "shape": statement_shape(statement),
+        "duration_ms": round(duration_ms, 3),
+        "executemany": executemany,
+    })
+    if duration_ms >= SQL_SLOW_QUERY_MS:
+        print(f"Медленный SQL ({duration_ms:.1f} мс) {profile.method} {profile.route}: {statement}")
+
+
+def install_listeners() -> None:
+    """Подключение слушателей к движкам app.database"""
+    for target in (engine, async_engine.sync_engine):
+        if not event.contains(target, "before_cursor_execute", _before_cursor_execute):
+            event.listen(target, "before_cursor_execute", _before_cursor_execute)
+            event.listen(target, "after_cursor_execute", _after_cursor_execute)
+
+
+class SQLProfilingMiddleware:
+    """Сбор SQL по HTTP-запросу: медленные запросы, N+1, заголовок X-SQL-Profile"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        install_listeners()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith("/debug/sql"):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append(PROFILE_HEADER, profile.summary())
+            await send(message)
+
+        token = _current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            for item in profile.repeated():
+                print(
+                    f"Возможный N+1 в {profile.method} {profile.route}: "
+                    f"{item['count']} раз {item['shape']}"
+                )
+            recent_profiles.append(profile.to_dict())
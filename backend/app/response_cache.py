@@ -0,0 +1,342 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from fastapi import Request, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models import Comment, Company, Document, DocumentVersion, Partner, Signature
+
+load_dotenv()
+
+# Кэш ответов GET: memory | redis | none. По умолчанию redis, если задан REDIS_URL:
+# memory сбрасывается только в своём процессе и годится лишь для одного воркера
+RESPONSE_CACHE_BACKEND = os.getenv(
+    "RESPONSE_CACHE_BACKEND", "redis" if os.getenv("REDIS_URL") else "none"
+).lower()
+# TTL - страховка; актуальность обеспечивается сбросом при записи
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+RESPONSE_CACHE_MAXSIZE = int(os.getenv("RESPONSE_CACHE_MAXSIZE", "10000"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+# Ключ - ресурс, вариант - компания и параметры запроса. Сброс ресурса
+# удаляет все его варианты одной операцией и увеличивает поколение ключа:
+# ответ, прочитанный из БД до сброса, в кэш уже не записывается
+def company_key(company_id: int) -> str:
+    return f"response:company:{company_id}"
+
+
+def partners_key(company_id: int) -> str:
+    return f"response:partners:{company_id}"
+
+
+def document_key(document_id: int) -> str:
+    return f"response:document:{document_id}"
+
+
+def make_etag(*parts) -> str:
+    """Сильный ETag из версии ресурса (updated_at, version, вариант)"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def body_etag(body: bytes) -> str:
+    """Сильный ETag по содержимому (для списков без общей версии)"""
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+class MemoryResponseCache:
+    """In-process LRU-кэш с TTL (сброс виден только этому процессу)"""
+
+    def __init__(self, ttl: int, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, Dict[str, tuple]]" = OrderedDict()
+        self._size = 0
+        # Поколения сброшенных ключей (значения растут монотонно). Вытесненный
+        # ключ получает поколение не меньше вытесненного, поэтому запись,
+        # начатая до сброса, не совпадёт с текущим поколением
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+        self._generation_counter = itertools.count(1)
+        self._generation_floor = 0
+
+    def _generation(self, key: str) -> int:
+        return self._generations.get(key, self._generation_floor)
+
+    async def get(self, key: str, variant: str) -> Tuple[Optional[dict], int]:
+        generation = self._generation(key)
+        entry = self._data.get(key, {}).get(variant)
+        if entry is None:
+            return None, generation
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._data[key].pop(variant, None)
+            self._size -= 1
+            return None, generation
+        self._data.move_to_end(key)
+        return value, generation
+
+    async def set(self, key: str, variant: str, value: dict, generation: int) -> None:
+        if self._generation(key) != generation:
+            return
+        variants = self._data.setdefault(key, {})
+        if variant not in variants:
+            self._size += 1
+        variants[variant] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while self._size > self.maxsize and self._data:
+            _, evicted = self._data.popitem(last=False)
+            self._size -= len(evicted)
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        self.delete_nowait(keys)
+
+    def delete_nowait(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._size -= len(self._data.pop(key, {}))
+            self._generations[key] = next(self._generation_counter)
+            self._generations.move_to_end(key)
+        while len(self._generations) > self.maxsize:
+            _, evicted = self._generations.popitem(last=False)
+            self._generation_floor = max(self._generation_floor, evicted)
+
+
+# Сбросы Redis, запущенные из after_commit: ссылки держатся до завершения
+# задачи, InvalidationMiddleware дожидается их перед отправкой ответа
+_pending_invalidations: Set[asyncio.Task] = set()
+
+
+def _invalidation_done(task: asyncio.Task) -> None:
+    _pending_invalidations.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Ошибка сброса кэша: {task.exception()}")
+
+
+async def wait_invalidations() -> None:
+    """Ожидание запущенных сбросов кэша (ответ после записи не читает устаревший кэш)"""
+    if _pending_invalidations:
+        await asyncio.gather(*list(_pending_invalidations), return_exceptions=True)
+
+
+def generation_key(key: str) -> str:
+    return f"{key}:generation"
+
+
+# Запись варианта, только если поколение ключа не изменилось с момента чтения
+_REDIS_STORE_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], ARGV[2], ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+
+class RedisResponseCache:
+    """Кэш в Redis (hash на ресурс), общий для всех воркеров; ошибки Redis не ломают ответы"""
+
+    def __init__(self, url: str, ttl: int):
+        import redis.asyncio as redis
+
+        self.ttl = ttl
+        self._redis = redis.from_url(url)
+        self._store = self._redis.register_script(_REDIS_STORE_SCRIPT)
+
+    async def get(self, key: str, variant: str) -> Tuple[Optional[dict], int]:
+        try:
+            async with self._redis.pipeline(transaction=False) as pipe:
+                pipe.hget(key, variant)
+                pipe.get(generation_key(key))
+                raw, generation = await pipe.execute()
+        except Exception as e:
+            print(f"Ошибка чтения кэша ответов: {e}")
+            # Без известного поколения ответ не будет записан
+            return None, -1
+        return (json.loads(raw) if raw else None), int(generation or 0)
+
+    async def set(self, key: str, variant: str, value: dict, generation: int) -> None:
+        if generation < 0:
+            return
+        try:
+            await self._store(
+                keys=[key, generation_key(key)],
+                args=[generation, variant, json.dumps(value), self.ttl],
+            )
+        except Exception as e:
+            print(f"Ошибка записи кэша ответов: {e}")
+
+    def _invalidate(self, pipe, keys: list) -> None:
+        for key in keys:
+            pipe.incr(generation_key(key))
+            pipe.expire(generation_key(key), self.ttl)
+        pipe.delete(*keys)
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        if not keys:
+            return
+        try:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                self._invalidate(pipe, keys)
+                await pipe.execute()
+        except Exception as e:
+            print(f"Ошибка сброса кэша ответов: {e}")
+
+    def delete_nowait(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        if not keys:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(self.delete(keys))
+        except RuntimeError:
+            import redis
+
+            with redis.from_url(REDIS_URL).pipeline(transaction=True) as pipe:
+                self._invalidate(pipe, keys)
+                pipe.execute()
+            return
+        _pending_invalidations.add(task)
+        task.add_done_callback(_invalidation_done)
+
+
+class NullResponseCache:
+    """Кэш отключён"""
+
+    async def get(self, key: str, variant: str) -> Tuple[Optional[dict], int]:
+        return None, 0
+
+    async def set(self, key: str, variant: str, value: dict, generation: int) -> None:
+        pass
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        pass
+
+    def delete_nowait(self, keys: Iterable[str]) -> None:
+        pass
+
+
+def _create_cache():
+    if RESPONSE_CACHE_BACKEND == "redis":
+        return RedisResponseCache(REDIS_URL, RESPONSE_CACHE_TTL)
+    if RESPONSE_CACHE_BACKEND == "memory":
+        return MemoryResponseCache(RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAXSIZE)
+    return NullResponseCache()
+
+
+response_cache = _create_cache()
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+
+
+def _build_response(request: Request, entry: dict) -> Response:
+    headers = {**entry.get("headers", {}), "ETag": entry["etag"], "Cache-Control": "private, no-cache"}
+    if _etag_matches(request, entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+
+def _read_generations(request: Request) -> Dict[tuple, int]:
+    if not hasattr(request.state, "response_generations"):
+        request.state.response_generations = {}
+    return request.state.response_generations
+
+
+async def cached_response(request: Request, key: str, variant: str) -> Optional[Response]:
+    """Ответ из кэша (200 или 304 по If-None-Match) без обращения к БД"""
+    entry, generation = await response_cache.get(key, variant)
+    if entry is None:
+        # Поколение до чтения из БД: по нему store_response отбросит устаревший ответ
+        _read_generations(request)[key, variant] = generation
+        return None
+    return _build_response(request, entry)
+
+
+async def store_response(
+    request: Request,
+    key: str,
+    variant: str,
+    etag: str,
+    body: bytes,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """Сохранение сериализованного ответа и отдача его клиенту.
+
+    Ответ записывается, только если ключ не сбрасывался после промаха
+    cached_response: иначе он мог быть прочитан из БД до изменения.
+    """
+    entry = {"etag": etag, "body": body.decode(), "headers": headers or {}}
+    generation = _read_generations(request).pop((key, variant), None)
+    if generation is not None:
+        await response_cache.set(key, variant, entry, generation)
+    return _build_response(request, entry)
+
+
+class InvalidationMiddleware:
+    """Отправка ответа после завершения сбросов кэша, запущенных его commit"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_after_invalidation(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                await wait_invalidations()
+            await send(message)
+
+        await self.app(scope, receive, send_after_invalidation)
+
+
+def invalidate_after_commit(db, *keys: str) -> None:
+    """Сброс ключей после commit текущей транзакции (для UPDATE/DELETE мимо ORM)"""
+    db.info.setdefault("invalidated_responses", set()).update(keys)
+
+
+# Изменения через ORM собираются автоматически при flush
+# и применяются к кэшу только после успешного commit
+@event.listens_for(Session, "before_flush")
+def _collect_changed_resources(session, flush_context, instances):
+    keys = session.info.setdefault("invalidated_responses", set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Company):
+            keys.add(company_key(obj.id))
+        elif isinstance(obj, Document):
+            keys.add(document_key(obj.id))
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Partner):
+            keys.add(partners_key(obj.company_id))
+        elif isinstance(obj, (Signature, DocumentVersion, Comment)) and obj.document_id:
+            keys.add(document_key(obj.document_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_resources(session):
+    keys = session.info.pop("invalidated_responses", None)
+    if keys:
+        response_cache.delete_nowait(keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_resources(session):
+    session.info.pop("invalidated_responses", None)
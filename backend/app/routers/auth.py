@@ -1,13 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models import User, Company
 from app.schemas import Token, RegisterRequest
 from app.auth import (
-    verify_password,
-    get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
     create_access_token,
     create_refresh_token,
     get_current_user,
@@ -19,11 +20,12 @@ router = APIRouter()
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Авторизация пользователя"""
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    result = await db.execute(select(User).where(User.email == form_data.username))
+    user = result.scalar_one_or_none()
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный email или пароль",
@@ -45,37 +47,42 @@ async def login(
 @router.post("/register", response_model=Token)
 async def register(
     request: RegisterRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Регистрация новой компании и пользователя"""
     # Проверка существующего пользователя
-    if db.query(User).filter(User.email == request.email).first():
+    result = await db.execute(select(User.id).where(User.email == request.email))
+    if result.first():
         raise HTTPException(status_code=400, detail="Email уже зарегистрирован")
     
     # Проверка существующей компании
-    if db.query(Company).filter(Company.inn == request.inn).first():
+    result = await db.execute(select(Company.id).where(Company.inn == request.inn))
+    if result.first():
         raise HTTPException(status_code=400, detail="Компания с таким ИНН уже зарегистрирована")
     
+    # Хэширование в отдельном пуле, до открытия транзакции на запись
+    hashed_password = await get_password_hash_async(request.password)
+    
     # Создание компании
     company = Company(
         name=request.company_name,
         inn=request.inn,
     )
     db.add(company)
-    db.flush()
+    await db.flush()
     
     # Создание пользователя (админ компании)
     user = User(
         email=request.email,
-        hashed_password=get_password_hash(request.password),
+        hashed_password=hashed_password,
         full_name=request.full_name,
         company_id=company.id,
         role="admin",
         is_active=True,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     access_token = create_access_token(data={"sub": user.id})
     refresh_token = create_refresh_token(data={"sub": user.id})
@@ -90,7 +97,7 @@ async def register(
 @router.post("/refresh", response_model=Token)
 async def refresh_token(
     refresh_token: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Обновление access token"""
     from jose import JWTError, jwt
@@ -104,7 +111,8 @@ async def refresh_token(
     except JWTError:
         raise HTTPException(status_code=401, detail="Невалидный токен")
     
-    user = db.query(User).filter(User.id == user_id).first()
+    result = await db.execute(select(User).where(User.id == user_id))
+    user = result.scalar_one_or_none()
     if not user or not user.is_active:
         raise HTTPException(status_code=401, detail="Пользователь не найден")
     
@@ -118,6 +126,16 @@ async def refresh_token(
     }
 
 
+@router.post("/logout")
+async def logout(
+    current_user: User = Depends(get_current_user)
+):
+    """Выход: закрытие всех сессий подписания пользователя"""
+    from app.signing import signing_sessions
+    closed = signing_sessions.close_user(current_user.id)
+    return {"message": "Выход выполнен", "signing_sessions_closed": closed}
+
+
 @router.get("/me")
 async def get_current_user_info(
     current_user: User = Depends(get_current_user)
@@ -125,6 +143,3 @@ async def get_current_user_info(
     """Получение информации о текущем пользователе"""
     from app.schemas import UserResponse
     return UserResponse.from_orm(current_user)
-
-
-
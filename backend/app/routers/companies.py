@@ -1,45 +1,60 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models import Company, User
 from app.schemas import CompanyResponse, CompanyUpdate
 from app.auth import get_current_active_user
+from app.search import refresh_received_documents_search
+from app.response_cache import cached_response, store_response, company_key, make_etag
 
 router = APIRouter()
 
 
+async def _get_company(db: AsyncSession, company_id: int) -> Company:
+    result = await db.execute(select(Company).where(Company.id == company_id))
+    company = result.scalar_one_or_none()
+    if not company:
+        raise HTTPException(status_code=404, detail="Компания не найдена")
+    return company
+
+
 @router.get("/me", response_model=CompanyResponse)
 async def get_my_company(
+    request: Request,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Получение компании текущего пользователя"""
-    company = db.query(Company).filter(Company.id == current_user.company_id).first()
-    if not company:
-        raise HTTPException(status_code=404, detail="Компания не найдена")
-    return company
+    """Получение компании текущего пользователя (кэш, ETag/304)"""
+    key = company_key(current_user.company_id)
+    cached = await cached_response(request, key, "")
+    if cached is not None:
+        return cached
+    company = await _get_company(db, current_user.company_id)
+    body = CompanyResponse.model_validate(company).model_dump_json().encode()
+    etag = make_etag(company.id, company.updated_at or company.created_at)
+    return await store_response(request, key, "", etag, body)
 
 
 @router.put("/me", response_model=CompanyResponse)
 async def update_my_company(
     company_update: CompanyUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Обновление данных компании"""
-    company = db.query(Company).filter(Company.id == current_user.company_id).first()
-    if not company:
-        raise HTTPException(status_code=404, detail="Компания не найдена")
+    company = await _get_company(db, current_user.company_id)
     
     update_data = company_update.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(company, field, value)
     
-    db.commit()
-    db.refresh(company)
+    # Наименование входит в поисковый индекс документов, полученных компанией
+    if "name" in update_data:
+        await db.flush()
+        await refresh_received_documents_search(db, company.id)
+    await db.commit()
+    await db.refresh(company)
     return company
-
-
-
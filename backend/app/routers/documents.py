@@ -1,62 +1,377 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select, delete, update, insert, func, or_, and_, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload, joinedload
+from typing import Dict, List, Optional, Tuple
+from collections import Counter
 from datetime import datetime
 
-from app.database import get_db
-from app.models import Document, User, Company, DocumentStatus
-from app.schemas import DocumentResponse, DocumentCreate, DocumentUpdate
+from app.database import get_async_db
+from app.models import Document, DocumentVersion, Signature, Comment, User, Company, DocumentStatus, DocumentDirection, DocumentStat, StoredObject
+from app.schemas import (
+    DocumentResponse,
+    DocumentCreate,
+    DocumentUpdate,
+    DocumentBulkIdsRequest,
+    DocumentBulkStatusRequest,
+    DocumentExpandedResponse,
+    DocumentStatsBucket,
+    DocumentStatsResponse,
+    DocumentVersionResponse,
+    SignatureResponse,
+    CommentResponse,
+    CompanyResponse,
+)
 from app.auth import get_current_active_user
+from app.pagination import paginate, paginate_merged
+from app.storage import release_reference, remove_unreferenced_file
+from app.search import SEARCH_CONFIG, refresh_document_search
+from app.serialization import document_list, document_expanded_list, list_response
+from app.response_cache import cached_response, store_response, invalidate_after_commit, document_key, make_etag
 
 router = APIRouter()
 
+# Максимум документов в одной массовой операции
+BULK_LIMIT = 500
 
-@router.get("/", response_model=List[DocumentResponse])
+# Допустимые переходы статусов при массовой смене: новый статус -> из каких
+ALLOWED_TRANSITIONS = {
+    DocumentStatus.PENDING: {DocumentStatus.DRAFT},
+    DocumentStatus.SENT: {DocumentStatus.PENDING, DocumentStatus.SIGNED},
+    DocumentStatus.ARCHIVED: {
+        DocumentStatus.DRAFT,
+        DocumentStatus.PENDING,
+        DocumentStatus.SIGNED,
+        DocumentStatus.SENT,
+        DocumentStatus.REJECTED,
+    },
+}
+
+
+# Связи, доступные через ?expand=. Коллекции грузятся selectinload (один
+# запрос на связь для всей страницы), ссылки на компании - joinedload
+EXPAND_OPTIONS = {
+    "signatures": selectinload(Document.signatures).selectinload(Signature.signer),
+    "versions": selectinload(Document.versions),
+    "comments": selectinload(Document.comments).selectinload(Comment.user),
+    "sender_company": joinedload(Document.sender_company),
+    "receiver_company": joinedload(Document.receiver_company),
+}
+
+
+CACHE_EXCLUDED_EXPAND = {"sender_company", "receiver_company"}
+
+
+def _related_versions(document: Document, expand_names: List[str]) -> List[tuple]:
+    """Версии загруженных связей для ETag: значения колонок каждой строки
+    (id, updated_at и т.д.), чтобы правка или замена связи при том же их
+    числе меняла ETag"""
+    versions = []
+    for name in expand_names:
+        related = getattr(document, name)
+        for row in related if isinstance(related, list) else [related]:
+            if row is not None:
+                state = inspect(row)
+                versions.append((name, *(state.dict.get(attr.key) for attr in state.mapper.column_attrs)))
+    return versions
+
+
+def _parse_expand(expand: Optional[str]) -> List[str]:
+    if not expand:
+        return []
+    names = [name.strip() for name in expand.split(",") if name.strip()]
+    unknown = [name for name in names if name not in EXPAND_OPTIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неизвестные связи: {', '.join(unknown)}. Доступны: {', '.join(EXPAND_OPTIONS)}",
+        )
+    return list(dict.fromkeys(names))
+
+
+def _serialize_document(document: Document, expand: List[str]) -> DocumentExpandedResponse:
+    """Сериализация документа; связи читаются только если загружены через expand"""
+    data = DocumentResponse.model_validate(document).model_dump()
+    if "signatures" in expand:
+        data["signatures"] = [
+            SignatureResponse(
+                id=signature.id,
+                document_id=signature.document_id,
+                signer_id=signature.signer_id,
+                signer_name=signature.signer.full_name,
+                certificate_serial=signature.certificate_serial,
+                is_valid=signature.is_valid,
+                signed_at=signature.signed_at,
+            )
+            for signature in document.signatures
+        ]
+    if "versions" in expand:
+        data["versions"] = [DocumentVersionResponse.model_validate(version) for version in document.versions]
+    if "comments" in expand:
+        data["comments"] = [
+            CommentResponse(
+                id=comment.id,
+                document_id=comment.document_id,
+                user_id=comment.user_id,
+                user_name=comment.user.full_name,
+                text=comment.text,
+                created_at=comment.created_at,
+            )
+            for comment in document.comments
+        ]
+    for name in ("sender_company", "receiver_company"):
+        if name in expand:
+            company = getattr(document, name)
+            data[name] = CompanyResponse.model_validate(company) if company else None
+    return DocumentExpandedResponse(**data)
+
+
+async def _get_own_document(db: AsyncSession, document_id: int, company_id: int, expand: List[str] = ()) -> Document:
+    result = await db.execute(
+        select(Document).where(
+            Document.id == document_id,
+            Document.sender_company_id == company_id
+        ).options(*[EXPAND_OPTIONS[name] for name in expand])
+    )
+    document = result.scalar_one_or_none()
+    if not document:
+        raise HTTPException(status_code=404, detail="Документ не найден")
+    return document
+
+
+async def _get_visible_document(db: AsyncSession, document_id: int, company_id: int, expand: List[str] = ()) -> Document:
+    """Документ, где компания отправитель или получатель (только чтение)"""
+    result = await db.execute(
+        select(Document).where(
+            Document.id == document_id,
+            or_(Document.sender_company_id == company_id, Document.receiver_company_id == company_id)
+        ).options(*[EXPAND_OPTIONS[name] for name in expand])
+    )
+    document = result.scalar_one_or_none()
+    if not document:
+        raise HTTPException(status_code=404, detail="Документ не найден")
+    return document
+
+
+async def _release_document_files(db: AsyncSession, company_id: int, document_ids: List[int]) -> List[Tuple[str, str]]:
+    """Освобождение ссылок версий на файлы и удаление версий.
+
+    Ссылкой считается только версия, путь которой совпадает с путём объекта
+    хранилища: версии со старыми путями в ref_count не учитывались.
+    Возвращает (хэш, путь) файлов без ссылок, удаляемых после commit.
+    """
+    result = await db.execute(
+        select(DocumentVersion.hash)
+        .join(
+            StoredObject,
+            and_(
+                StoredObject.company_id == company_id,
+                StoredObject.hash == DocumentVersion.hash,
+                StoredObject.path == DocumentVersion.file_path,
+            ),
+        )
+        .where(DocumentVersion.document_id.in_(document_ids))
+    )
+    orphaned = []
+    for file_hash, count in Counter(h for h in result.scalars().all() if h).items():
+        path = await release_reference(db, company_id, file_hash, count)
+        if path:
+            orphaned.append((file_hash, path))
+    await db.execute(delete(DocumentVersion).where(DocumentVersion.document_id.in_(document_ids)))
+    return orphaned
+
+
+async def _delete_blockers(db: AsyncSession, document_ids) -> Dict[int, str]:
+    """Документы, удаление которых нарушит ссылки, и причина для каждого.
+
+    Подписи и комментарии ссылаются на документ без каскада, дочерние
+    документы - через parent_document_id. Дочерний документ не мешает, если
+    удаляется вместе с родителем.
+    """
+    document_ids = set(document_ids)
+    if not document_ids:
+        return {}
+    blockers: Dict[int, str] = {}
+    
+    result = await db.execute(
+        select(Signature.document_id).where(Signature.document_id.in_(document_ids)).distinct()
+    )
+    for document_id in result.scalars().all():
+        blockers[document_id] = "Подписанный документ нельзя удалить"
+    
+    result = await db.execute(
+        select(Comment.document_id).where(Comment.document_id.in_(document_ids)).distinct()
+    )
+    for document_id in result.scalars().all():
+        blockers.setdefault(document_id, "У документа есть комментарии")
+    
+    result = await db.execute(
+        select(Document.parent_document_id, Document.id).where(Document.parent_document_id.in_(document_ids))
+    )
+    children = result.all()
+    # Родитель заблокирован, если хоть один потомок остаётся; повторяем до устойчивости
+    changed = True
+    while changed:
+        changed = False
+        for parent_id, child_id in children:
+            if parent_id in blockers:
+                continue
+            if child_id not in document_ids or child_id in blockers:
+                blockers[parent_id] = "На документ ссылаются дочерние документы"
+                changed = True
+    return blockers
+
+
+def _check_bulk_ids(document_ids: List[int]) -> List[int]:
+    document_ids = list(dict.fromkeys(document_ids))
+    if not document_ids:
+        raise HTTPException(status_code=400, detail="Список документов пуст")
+    if len(document_ids) > BULK_LIMIT:
+        raise HTTPException(status_code=400, detail=f"Не более {BULK_LIMIT} документов за раз")
+    return document_ids
+
+
+@router.get("/", response_model=List[DocumentExpandedResponse], response_model_exclude_unset=True)
 async def get_documents(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
     status: Optional[DocumentStatus] = None,
     document_type: Optional[str] = None,
+    direction: DocumentDirection = DocumentDirection.OUTGOING,
+    expand: Optional[str] = Query(None, description="Связи через запятую: signatures, versions, comments, sender_company, receiver_company"),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Получение списка документов"""
-    query = db.query(Document).filter(
-        Document.sender_company_id == current_user.company_id
-    )
-    
+    """Получение реестра документов: исходящие, входящие или все"""
+    expand_names = _parse_expand(expand)
+    options = [EXPAND_OPTIONS[name] for name in expand_names]
+    company_id = current_user.company_id
+
+    filters = []
     if status:
-        query = query.filter(Document.status == status)
+        filters.append(Document.status == status)
     if document_type:
-        query = query.filter(Document.document_type == document_type)
+        filters.append(Document.document_type == document_type)
+
+    outgoing = [Document.sender_company_id == company_id, *filters]
+    incoming = [Document.receiver_company_id == company_id, *filters]
+
+    if direction == DocumentDirection.ALL:
+        # Две ветки по своим индексам, самоадресованные документы - только в исходящей
+        incoming.append(Document.sender_company_id != company_id)
+        documents = await paginate_merged(
+            db, Document, [outgoing, incoming], response, limit,
+            skip=skip, cursor=cursor, options=options,
+        )
+    else:
+        conditions = outgoing if direction == DocumentDirection.OUTGOING else incoming
+        query = select(Document).where(*conditions).options(*options)
+        documents = await paginate(db, query, Document, response, limit, skip=skip, cursor=cursor)
     
-    documents = query.order_by(Document.created_at.desc()).offset(skip).limit(limit).all()
-    return documents
+    if not expand_names:
+        return list_response(document_list, documents, response)
+    return list_response(
+        document_expanded_list,
+        [_serialize_document(document, expand_names) for document in documents],
+        response,
+        exclude_unset=True,
+    )
+
+
+@router.get("/search", response_model=List[DocumentResponse])
+async def search_documents(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Полнотекстовый поиск по номеру, контрагенту и тексту документа"""
+    ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    rank = func.ts_rank_cd(Document.search_vector, ts_query)
+    query = (
+        select(Document)
+        .where(
+            Document.sender_company_id == current_user.company_id,
+            Document.search_vector.op("@@")(ts_query)
+        )
+        .order_by(rank.desc(), Document.created_at.desc())
+        .limit(limit)
+    )
+    result = await db.execute(query)
+    return list_response(document_list, result.scalars().all())
+
+
+@router.get("/stats", response_model=DocumentStatsResponse)
+async def get_document_stats(
+    direction: DocumentDirection = DocumentDirection.ALL,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Сводка для дашборда: количество и суммы по статусам и типам.
+
+    Читается из document_stats (не больше строк, чем пар статус/тип),
+    поэтому не зависит от объёма реестра.
+    """
+    query = select(DocumentStat).where(
+        DocumentStat.company_id == current_user.company_id,
+        DocumentStat.count > 0
+    )
+    if direction != DocumentDirection.ALL:
+        query = query.where(DocumentStat.direction == direction.value)
+    result = await db.execute(query)
+
+    stats = DocumentStatsResponse()
+    for row in result.scalars().all():
+        for bucket in (
+            stats,
+            stats.by_status.setdefault(row.status, DocumentStatsBucket()),
+            stats.by_type.setdefault(row.document_type, DocumentStatsBucket()),
+        ):
+            bucket.count += row.count
+            bucket.amount += float(row.amount)
+            bucket.nds += float(row.nds)
+    return stats
 
 
-@router.get("/{document_id}", response_model=DocumentResponse)
+@router.get("/{document_id}", response_model=DocumentExpandedResponse, response_model_exclude_unset=True)
 async def get_document(
+    request: Request,
     document_id: int,
+    expand: Optional[str] = Query(None, description="Связи через запятую: signatures, versions, comments, sender_company, receiver_company"),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Получение документа по ID"""
-    document = db.query(Document).filter(
-        Document.id == document_id,
-        Document.sender_company_id == current_user.company_id
-    ).first()
+    """Получение документа по ID (исходящего или входящего), кэш и ETag/304"""
+    expand_names = _parse_expand(expand)
+    # Данные компаний сбрасываются по своим ключам, такие варианты не кэшируются
+    cacheable = not CACHE_EXCLUDED_EXPAND.intersection(expand_names)
+    key = document_key(document_id)
+    variant = f"{current_user.company_id}:{','.join(sorted(expand_names))}"
+    if cacheable:
+        cached = await cached_response(request, key, variant)
+        if cached is not None:
+            return cached
     
-    if not document:
-        raise HTTPException(status_code=404, detail="Документ не найден")
+    document = await _get_visible_document(db, document_id, current_user.company_id, expand_names)
+    payload = _serialize_document(document, expand_names)
+    if not cacheable:
+        return payload
     
-    return document
+    etag = make_etag(
+        document.id, document.version, document.updated_at or document.created_at, variant,
+        *_related_versions(document, expand_names),
+    )
+    body = payload.model_dump_json(exclude_unset=True).encode()
+    return await store_response(request, key, variant, etag, body)
 
 
 @router.post("/", response_model=DocumentResponse)
 async def create_document(
     document: DocumentCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Создание нового документа"""
     db_document = Document(
@@ -66,8 +381,10 @@ async def create_document(
         version=1,
     )
     db.add(db_document)
-    db.commit()
-    db.refresh(db_document)
+    await db.flush()
+    await refresh_document_search(db, [db_document.id])
+    await db.commit()
+    await db.refresh(db_document)
     return db_document
 
 
@@ -76,23 +393,20 @@ async def update_document(
     document_id: int,
     document_update: DocumentUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Обновление документа"""
-    document = db.query(Document).filter(
-        Document.id == document_id,
-        Document.sender_company_id == current_user.company_id
-    ).first()
-    
-    if not document:
-        raise HTTPException(status_code=404, detail="Документ не найден")
+    document = await _get_own_document(db, document_id, current_user.company_id)
     
     update_data = document_update.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(document, field, value)
     
-    db.commit()
-    db.refresh(document)
+    if "number" in update_data:
+        await db.flush()
+        await refresh_document_search(db, [document.id])
+    await db.commit()
+    await db.refresh(document)
     return document
 
 
@@ -100,20 +414,176 @@ async def update_document(
 async def delete_document(
     document_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Удаление документа"""
-    document = db.query(Document).filter(
-        Document.id == document_id,
-        Document.sender_company_id == current_user.company_id
-    ).first()
+    document = await _get_own_document(db, document_id, current_user.company_id)
     
-    if not document:
-        raise HTTPException(status_code=404, detail="Документ не найден")
+    blockers = await _delete_blockers(db, [document.id])
+    if document.id in blockers:
+        raise HTTPException(status_code=400, detail=blockers[document.id])
+    
+    orphaned = await _release_document_files(db, current_user.company_id, [document.id])
+    
+    await db.delete(document)
+    await db.commit()
     
-    db.delete(document)
-    db.commit()
+    # Файлы без ссылок удаляются только после успешного commit
+    for file_hash, path in orphaned:
+        await remove_unreferenced_file(db, current_user.company_id, file_hash, path)
     return {"message": "Документ удалён"}
 
 
+@router.post("/bulk")
+async def create_documents_bulk(
+    documents: List[DocumentCreate],
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Массовое создание документов одной транзакцией"""
+    if not documents:
+        raise HTTPException(status_code=400, detail="Список документов пуст")
+    if len(documents) > BULK_LIMIT:
+        raise HTTPException(status_code=400, detail=f"Не более {BULK_LIMIT} документов за раз")
+    
+    # Проверка получателей одним запросом
+    receiver_ids = {document.receiver_company_id for document in documents if document.receiver_company_id}
+    existing_receivers = set()
+    if receiver_ids:
+        result = await db.execute(select(Company.id).where(Company.id.in_(receiver_ids)))
+        existing_receivers = set(result.scalars().all())
+    
+    results: List[Dict] = []
+    values = []
+    positions = []
+    for index, document in enumerate(documents):
+        if document.receiver_company_id and document.receiver_company_id not in existing_receivers:
+            results.append({"index": index, "success": False, "error": "Компания-получатель не найдена"})
+            continue
+        values.append({
+            **document.dict(),
+            "sender_company_id": current_user.company_id,
+            "status": DocumentStatus.DRAFT,
+            "version": 1,
+        })
+        positions.append(index)
+        results.append(None)
+    
+    if values:
+        result = await db.scalars(
+            insert(Document).returning(Document, sort_by_parameter_order=True),
+            values,
+        )
+        created = result.all()
+        await refresh_document_search(db, [document.id for document in created])
+        await db.commit()
+        for index, document in zip(positions, created):
+            results[index] = {
+                "index": index,
+                "success": True,
+                "document": DocumentResponse.model_validate(document),
+            }
+    
+    return {"created": len(values), "failed": len(documents) - len(values), "results": results}
 
+
+@router.post("/bulk/status")
+async def update_documents_status_bulk(
+    request: DocumentBulkStatusRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Массовая смена статуса (черновик → на согласовании → отправлен, архив)"""
+    document_ids = _check_bulk_ids(request.document_ids)
+    allowed_from = ALLOWED_TRANSITIONS.get(request.status)
+    if allowed_from is None:
+        raise HTTPException(status_code=400, detail="Недопустимый целевой статус")
+    
+    result = await db.execute(
+        select(Document.id, Document.status).where(
+            Document.id.in_(document_ids),
+            Document.sender_company_id == current_user.company_id
+        )
+    )
+    current = dict(result.all())
+    
+    # Один UPDATE для всех документов с допустимым переходом; условие на
+    # статус повторяется в WHERE на случай параллельного изменения
+    eligible = [document_id for document_id in document_ids if current.get(document_id) in allowed_from]
+    updated = set()
+    if eligible:
+        result = await db.execute(
+            update(Document)
+            .where(
+                Document.id.in_(eligible),
+                Document.sender_company_id == current_user.company_id,
+                Document.status.in_(allowed_from)
+            )
+            .values(status=request.status)
+            .returning(Document.id)
+            .execution_options(synchronize_session=False)
+        )
+        updated = set(result.scalars().all())
+        invalidate_after_commit(db, *[document_key(document_id) for document_id in updated])
+        await db.commit()
+    
+    results = []
+    for document_id in document_ids:
+        if document_id in updated:
+            results.append({"document_id": document_id, "success": True})
+        elif document_id not in current:
+            results.append({"document_id": document_id, "success": False, "error": "Документ не найден"})
+        else:
+            results.append({
+                "document_id": document_id,
+                "success": False,
+                "error": f"Переход из статуса {current[document_id].value} в {request.status.value} недопустим",
+            })
+    return {"updated": len(updated), "failed": len(document_ids) - len(updated), "results": results}
+
+
+@router.post("/bulk/delete")
+async def delete_documents_bulk(
+    request: DocumentBulkIdsRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Массовое удаление документов одной транзакцией"""
+    document_ids = _check_bulk_ids(request.document_ids)
+    
+    result = await db.execute(
+        select(Document.id).where(
+            Document.id.in_(document_ids),
+            Document.sender_company_id == current_user.company_id
+        )
+    )
+    found = set(result.scalars().all())
+    
+    # Документы с подписями, комментариями или оставшимися дочерними не удаляются
+    blockers = await _delete_blockers(db, found)
+    found -= set(blockers)
+    
+    orphaned = []
+    if found:
+        orphaned = await _release_document_files(db, current_user.company_id, list(found))
+        await db.execute(
+            delete(Document)
+            .where(Document.id.in_(found))
+            .execution_options(synchronize_session=False)
+        )
+        invalidate_after_commit(db, *[document_key(document_id) for document_id in found])
+        await db.commit()
+    
+    # Файлы без ссылок удаляются только после успешного commit
+    for file_hash, path in orphaned:
+        await remove_unreferenced_file(db, current_user.company_id, file_hash, path)
+    
+    results = []
+    for document_id in document_ids:
+        if document_id in found:
+            results.append({"document_id": document_id, "success": True})
+        elif document_id in blockers:
+            results.append({"document_id": document_id, "success": False, "error": blockers[document_id]})
+        else:
+            results.append({"document_id": document_id, "success": False, "error": "Документ не найден"})
+    return {"deleted": len(found), "failed": len(document_ids) - len(found), "results": results}
@@ -1,50 +1,50 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse, StreamingResponse
-from sqlalchemy.orm import Session
-from typing import Optional
-import os
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Header
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Tuple
 from pathlib import Path
-from minio import Minio
+from urllib.parse import quote
 from minio.error import S3Error
-import hashlib
-from datetime import datetime
+from email.utils import formatdate
+import uuid
 
-from app.database import get_db
-from app.models import User, Document
+from app.database import get_async_db
+from app.models import User, Document, DocumentVersion, ProcessingJob, JobStatus, StoredObject
 from app.auth import get_current_active_user
-from dotenv import load_dotenv
-
-load_dotenv()
+from app.storage import (
+    minio_client,
+    MINIO_BUCKET,
+    UPLOAD_DIR,
+    hash_stream,
+    store_content,
+    add_reference,
+    iter_minio_object,
+    iter_local_file,
+)
+from app.tasks import process_stored_object
+from app.search import refresh_document_search
 
 router = APIRouter()
 
-# MinIO конфигурация
-MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "localhost:9000")
-MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
-MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
-MINIO_BUCKET = os.getenv("MINIO_BUCKET", "edo-documents")
-MINIO_USE_SSL = os.getenv("MINIO_USE_SSL", "false").lower() == "true"
-
-# Инициализация MinIO клиента
-try:
-    minio_client = Minio(
-        MINIO_ENDPOINT,
-        access_key=MINIO_ACCESS_KEY,
-        secret_key=MINIO_SECRET_KEY,
-        secure=MINIO_USE_SSL
-    )
-    
-    # Создание bucket если не существует
-    if not minio_client.bucket_exists(MINIO_BUCKET):
-        minio_client.make_bucket(MINIO_BUCKET)
-        print(f"Bucket '{MINIO_BUCKET}' создан")
-except Exception as e:
-    print(f"Ошибка инициализации MinIO: {e}")
-    minio_client = None
 
-# Fallback: локальная директория для загрузки файлов
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+async def _enqueue_processing(db: AsyncSession, job_id: str) -> None:
+    """Постановка задачи обработки в очередь Celery после commit.
+
+    Файл уже сохранён, поэтому ошибка брокера не прерывает загрузку:
+    задача помечается FAILED, и клиент видит причину по job_id.
+    """
+    try:
+        await run_in_threadpool(process_stored_object.apply_async, args=[job_id], task_id=job_id)
+    except Exception as e:
+        print(f"Ошибка постановки задачи обработки {job_id} в очередь: {e}")
+        await db.execute(
+            update(ProcessingJob)
+            .where(ProcessingJob.id == job_id)
+            .values(status=JobStatus.FAILED, error=f"Задача не поставлена в очередь: {e}")
+        )
+        await db.commit()
 
 
 @router.post("/upload")
@@ -52,7 +52,7 @@ async def upload_file(
     file: UploadFile = File(...),
     document_id: Optional[int] = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Загрузка файла"""
     # Проверка типа файла
@@ -61,72 +61,191 @@ async def upload_file(
     if file_ext not in allowed_extensions:
         raise HTTPException(status_code=400, detail="Недопустимый тип файла")
     
-    # Чтение содержимого файла
-    content = await file.read()
-    file_size = len(content)
-    
-    # Генерация хэша для проверки целостности
-    file_hash = hashlib.sha256(content).hexdigest()
+    content_type = file.content_type or "application/octet-stream"
+    # Исходное имя отдаётся при скачивании (в хранилище файл лежит под хэшем)
+    original_filename = Path(file.filename).name[:255]
     
-    # Генерация уникального пути
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    safe_filename = file.filename.replace(" ", "_")
-    object_name = f"{current_user.company_id}/{timestamp}_{safe_filename}"
-    
-    file_path = None
+    # Хэш считается потоково по уже принятому (spooled) файлу. Если такое
+    # содержимое у компании уже есть, байты в хранилище повторно не передаются
+    file_hash, file_size = await run_in_threadpool(hash_stream, file.file)
+    await file.seek(0)
+    stored, deduplicated = await store_content(
+        db, current_user.company_id, file.file, file_hash, file_size, file_ext, content_type, original_filename
+    )
+    file_path = stored.path
     
-    # Загрузка в MinIO если доступен
-    if minio_client:
-        try:
-            from io import BytesIO
-            minio_client.put_object(
-                MINIO_BUCKET,
-                object_name,
-                BytesIO(content),
-                file_size,
-                content_type=file.content_type or "application/octet-stream"
-            )
-            file_path = f"{MINIO_BUCKET}/{object_name}"
-        except S3Error as e:
-            print(f"Ошибка загрузки в MinIO: {e}")
-            # Fallback к локальному хранению
-            file_path_local = UPLOAD_DIR / f"{current_user.company_id}_{timestamp}_{safe_filename}"
-            with open(file_path_local, "wb") as buffer:
-                buffer.write(content)
-            file_path = str(file_path_local)
-    else:
-        # Локальное хранение
-        file_path_local = UPLOAD_DIR / f"{current_user.company_id}_{timestamp}_{safe_filename}"
-        with open(file_path_local, "wb") as buffer:
-            buffer.write(content)
-        file_path = str(file_path_local)
+    # Содержимое уже проверено и заражено: к документу не прикрепляется
+    if document_id and stored.scan_status == "infected":
+        raise HTTPException(status_code=400, detail="Файл не прошёл антивирусную проверку")
     
-    # Если загружается документ, обновляем путь в БД
+    # Если загружается документ, фиксируем новую версию и ссылку на объект
+    document = None
     if document_id:
-        document = db.query(Document).filter(
-            Document.id == document_id,
-            Document.sender_company_id == current_user.company_id
-        ).first()
+        result = await db.execute(
+            select(Document).where(
+                Document.id == document_id,
+                Document.sender_company_id == current_user.company_id
+            )
+        )
+        document = result.scalar_one_or_none()
         if document:
+            result = await db.execute(
+                select(func.max(DocumentVersion.version_number)).where(
+                    DocumentVersion.document_id == document.id
+                )
+            )
+            last_version = result.scalar()
+            version_number = last_version + 1 if last_version else document.version or 1
+            db.add(DocumentVersion(
+                document_id=document.id,
+                version_number=version_number,
+                file_path=file_path,
+                original_filename=original_filename,
+                hash=file_hash,
+                created_by=current_user.id,
+            ))
+            await add_reference(db, current_user.company_id, file_hash)
             document.original_file_path = file_path
-            db.commit()
+            document.version = version_number
+            await db.flush()
+            await refresh_document_search(db, [document.id])
+    
+    # Тяжёлая обработка (проверка целостности, антивирус, PDF, превью)
+    # выполняется в фоне; уже обработанное содержимое повторно не обрабатывается
+    job = None
+    if stored.processed_at is None:
+        job = ProcessingJob(
+            id=str(uuid.uuid4()),
+            company_id=current_user.company_id,
+            stored_object_id=stored.id,
+            document_id=document.id if document else None,
+            status=JobStatus.PENDING,
+        )
+        db.add(job)
+    
+    await db.commit()
+    
+    if job:
+        await _enqueue_processing(db, job.id)
     
     return {
         "filename": file.filename,
         "path": file_path,
         "size": file_size,
         "hash": file_hash,
-        "content_type": file.content_type
+        "content_type": file.content_type,
+        "deduplicated": deduplicated,
+        "job_id": job.id if job else None,
+        "page_count": stored.page_count,
+        "scan_status": stored.scan_status,
+    }
+
+
+def _parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Разбор заголовка Range (один диапазон); None — отдать файл целиком"""
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec:
+        # Несколько диапазонов не поддерживаем — отдаём файл целиком
+        return None
+    start_str, _, end_str = spec.partition("-")
+    try:
+        if start_str:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+        else:
+            # bytes=-N: последние N байт
+            start = max(size - int(end_str), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Запрошенный диапазон недоступен",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+def _content_disposition(filename: str) -> str:
+    """Content-Disposition для скачивания; не-ASCII имя кодируется по RFC 5987"""
+    quoted = quote(filename)
+    if quoted == filename:
+        return f'attachment; filename="{filename}"'
+    return f"attachment; filename*=utf-8''{quoted}"
+
+
+async def _download_filename(db: AsyncSession, company_id: int, file_path: str) -> Optional[str]:
+    """Исходное имя файла: из последней версии документа компании, иначе из объекта хранилища"""
+    result = await db.execute(
+        select(DocumentVersion.original_filename)
+        .join(Document, Document.id == DocumentVersion.document_id)
+        .where(
+            DocumentVersion.file_path == file_path,
+            DocumentVersion.original_filename.isnot(None),
+            Document.sender_company_id == company_id,
+        )
+        .order_by(DocumentVersion.id.desc())
+        .limit(1)
+    )
+    filename = result.scalar()
+    if filename:
+        return filename
+    result = await db.execute(
+        select(StoredObject.original_filename).where(
+            StoredObject.company_id == company_id,
+            StoredObject.path == file_path,
+        )
+    )
+    return result.scalar()
+
+
+def _range_response(
+    body,
+    size: int,
+    byte_range: Optional[Tuple[int, int]],
+    filename: str,
+    etag: Optional[str],
+    last_modified: Optional[str],
+) -> StreamingResponse:
+    """Ответ 200/206 с заголовками для докачки и частичной загрузки"""
+    headers = {
+        "Content-Disposition": _content_disposition(filename),
+        "Accept-Ranges": "bytes",
     }
+    if etag:
+        headers["ETag"] = etag
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    if byte_range:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        status_code = 206
+    else:
+        headers["Content-Length"] = str(size)
+        status_code = 200
+    return StreamingResponse(
+        body,
+        status_code=status_code,
+        media_type="application/octet-stream",
+        headers=headers,
+    )
 
 
 @router.get("/download/{bucket}/{object_name:path}")
 async def download_file(
     bucket: str,
     object_name: str,
-    current_user: User = Depends(get_current_active_user)
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None, alias="If-Range"),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Скачивание файла из MinIO или локального хранилища"""
+    """Скачивание файла из MinIO или локального хранилища (с поддержкой Range)"""
     # Проверка что файл принадлежит компании пользователя
     if not object_name.startswith(f"{current_user.company_id}/"):
         raise HTTPException(status_code=403, detail="Доступ запрещён")
@@ -134,34 +253,39 @@ async def download_file(
     # Попытка скачать из MinIO
     if minio_client and bucket == MINIO_BUCKET:
         try:
-            from io import BytesIO
-            response = minio_client.get_object(bucket, object_name)
-            content = response.read()
-            response.close()
-            response.release_conn()
-            
-            # Определение имени файла
-            filename = object_name.split("/")[-1]
-            
-            return StreamingResponse(
-                BytesIO(content),
-                media_type="application/octet-stream",
-                headers={
-                    "Content-Disposition": f'attachment; filename="{filename}"'
-                }
-            )
+            stat = await run_in_threadpool(minio_client.stat_object, bucket, object_name)
         except S3Error as e:
             raise HTTPException(status_code=404, detail="Файл не найден в хранилище")
+        
+        size = stat.size
+        etag = f'"{stat.etag}"' if stat.etag else None
+        last_modified = formatdate(stat.last_modified.timestamp(), usegmt=True) if stat.last_modified else None
+        file_path = f"{bucket}/{object_name}"
+    else:
+        # Fallback: локальное хранилище
+        full_path = UPLOAD_DIR / object_name.split("/")[-1]
+        
+        if not full_path.exists():
+            raise HTTPException(status_code=404, detail="Файл не найден")
+        
+        st = full_path.stat()
+        size = st.st_size
+        etag = f'"{st.st_mtime_ns:x}-{size:x}"'
+        last_modified = formatdate(st.st_mtime, usegmt=True)
+        file_path = str(full_path)
     
-    # Fallback: локальное хранилище
-    full_path = UPLOAD_DIR / object_name.split("/")[-1]
+    # If-Range: диапазон отдаётся только если файл не изменился
+    if if_range and if_range not in (etag, last_modified):
+        range_header = None
+    byte_range = _parse_range(range_header, size)
+    start, end = byte_range if byte_range else (0, size - 1)
+    length = end - start + 1
     
-    if not full_path.exists():
-        raise HTTPException(status_code=404, detail="Файл не найден")
+    if minio_client and bucket == MINIO_BUCKET:
+        body = iter_minio_object(object_name, start, length)
+    else:
+        body = iter_local_file(full_path, start, length)
     
-    return FileResponse(
-        path=full_path,
-        filename=full_path.name,
-        media_type="application/octet-stream"
-    )
-
+    # Определение имени файла
+    filename = await _download_filename(db, current_user.company_id, file_path) or object_name.split("/")[-1]
+    return _range_response(body, size, byte_range, filename, etag, last_modified)
@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+
+from app.database import get_async_db, AsyncSessionLocal
+from app.models import ProcessingJob, JobStatus, User
+from app.schemas import JobResponse
+from app.auth import get_current_active_user
+
+router = APIRouter()
+
+# Интервал опроса статуса для подписки и максимальное время подписки
+JOB_EVENTS_INTERVAL = 1.0
+JOB_EVENTS_TIMEOUT = 300
+
+_FINAL_STATUSES = (JobStatus.COMPLETED, JobStatus.FAILED)
+
+
+async def _get_own_job(db: AsyncSession, job_id: str, company_id: int) -> ProcessingJob:
+    result = await db.execute(
+        select(ProcessingJob).where(
+            ProcessingJob.id == job_id,
+            ProcessingJob.company_id == company_id
+        )
+    )
+    job = result.scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Статус фоновой задачи"""
+    return await _get_own_job(db, job_id, current_user.company_id)
+
+
+@router.get("/{job_id}/events")
+async def job_events(
+    job_id: str,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Подписка на изменения статуса задачи (Server-Sent Events)"""
+    await _get_own_job(db, job_id, current_user.company_id)
+    company_id = current_user.company_id
+
+    async def events():
+        last_status = None
+        elapsed = 0.0
+        while elapsed < JOB_EVENTS_TIMEOUT:
+            async with AsyncSessionLocal() as session:
+                job = await _get_own_job(session, job_id, company_id)
+            if job.status != last_status:
+                last_status = job.status
+                payload = JobResponse.model_validate(job).model_dump_json()
+                yield f"event: status\ndata: {payload}\n\n"
+            if job.status in _FINAL_STATUSES:
+                return
+            await asyncio.sleep(JOB_EVENTS_INTERVAL)
+            elapsed += JOB_EVENTS_INTERVAL
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
@@ -1,72 +1,131 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File
+from starlette.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import Select, select, func, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
+from pathlib import Path
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models import Partner, User
 from app.schemas import PartnerResponse, PartnerCreate
 from app.auth import get_current_active_user
+from app.pagination import NEXT_CURSOR_HEADER, paginate
+from app.partner_import import iter_csv_rows, iter_xlsx_rows, take
+from app.serialization import partner_list, dump_list
+from app.response_cache import cached_response, store_response, invalidate_after_commit, partners_key, body_etag
 
 router = APIRouter()
 
+# Размер пачки upsert при импорте и максимум ошибок в ответе
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_ERRORS = 1000
+
+
+async def _get_own_partner(db: AsyncSession, partner_id: int, company_id: int) -> Partner:
+    result = await db.execute(
+        select(Partner).where(
+            Partner.id == partner_id,
+            Partner.company_id == company_id
+        )
+    )
+    partner = result.scalar_one_or_none()
+    if not partner:
+        raise HTTPException(status_code=404, detail="Контрагент не найден")
+    return partner
+
+
+def _escape_like(value: str) -> str:
+    """Экранирование спецсимволов LIKE во вводе пользователя"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def apply_partner_search(query: Select, search: str) -> Select:
+    """Условие и порядок поиска контрагентов по строке ввода"""
+    pattern = _escape_like(search)
+    if search.isdigit():
+        # ИНН: поиск по префиксу (b-tree varchar_pattern_ops)
+        query = query.where(Partner.partner_inn.like(f"{pattern}%", escape="\\"))
+        return query.order_by(Partner.partner_inn, Partner.id)
+    # Подстрока наименования или ИНН (GIN pg_trgm), сортировка по сходству
+    query = query.where(
+        Partner.partner_name.ilike(f"%{pattern}%", escape="\\") |
+        Partner.partner_inn.ilike(f"%{pattern}%", escape="\\")
+    )
+    similarity = func.greatest(
+        func.similarity(Partner.partner_name, search),
+        func.similarity(Partner.partner_inn, search),
+    )
+    return query.order_by(similarity.desc(), Partner.id)
+
 
 @router.get("/", response_model=List[PartnerResponse])
 async def get_partners(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
     search: Optional[str] = None,
     is_connected: Optional[bool] = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Получение списка контрагентов"""
-    query = db.query(Partner).filter(Partner.company_id == current_user.company_id)
+    """Получение списка контрагентов (кэш по параметрам запроса, ETag/304)"""
+    key = partners_key(current_user.company_id)
+    variant = str(request.query_params)
+    cached = await cached_response(request, key, variant)
+    if cached is not None:
+        return cached
     
-    if search:
-        query = query.filter(
-            Partner.partner_name.ilike(f"%{search}%") |
-            Partner.partner_inn.ilike(f"%{search}%")
-        )
+    query = select(Partner).where(Partner.company_id == current_user.company_id)
     
     if is_connected is not None:
-        query = query.filter(Partner.is_connected == is_connected)
+        query = query.where(Partner.is_connected == is_connected)
+    
+    search = search.strip() if search else None
+    if search:
+        # Результаты поиска ранжируются по релевантности, курсор не применяется
+        query = apply_partner_search(query, search)
+        result = await db.execute(query.offset(skip).limit(limit))
+        partners = result.scalars().all()
+    else:
+        partners = await paginate(db, query, Partner, response, limit, skip=skip, cursor=cursor)
     
-    partners = query.order_by(Partner.created_at.desc()).offset(skip).limit(limit).all()
-    return partners
+    body = dump_list(partner_list, partners)
+    headers = {}
+    if NEXT_CURSOR_HEADER in response.headers:
+        headers[NEXT_CURSOR_HEADER] = response.headers[NEXT_CURSOR_HEADER]
+    return await store_response(request, key, variant, body_etag(body), body, headers)
 
 
 @router.get("/{partner_id}", response_model=PartnerResponse)
 async def get_partner(
     partner_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Получение контрагента по ID"""
-    partner = db.query(Partner).filter(
-        Partner.id == partner_id,
-        Partner.company_id == current_user.company_id
-    ).first()
-    
-    if not partner:
-        raise HTTPException(status_code=404, detail="Контрагент не найден")
-    
-    return partner
+    return await _get_own_partner(db, partner_id, current_user.company_id)
 
 
 @router.post("/", response_model=PartnerResponse)
 async def create_partner(
     partner: PartnerCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Создание нового контрагента"""
     # Проверка на существующего контрагента
-    existing = db.query(Partner).filter(
-        Partner.company_id == current_user.company_id,
-        Partner.partner_inn == partner.partner_inn
-    ).first()
+    result = await db.execute(
+        select(Partner.id).where(
+            Partner.company_id == current_user.company_id,
+            Partner.partner_inn == partner.partner_inn
+        )
+    )
     
-    if existing:
+    if result.first():
         raise HTTPException(status_code=400, detail="Контрагент с таким ИНН уже существует")
     
     db_partner = Partner(
@@ -75,29 +134,91 @@ async def create_partner(
         is_connected=False,
     )
     db.add(db_partner)
-    db.commit()
-    db.refresh(db_partner)
+    await db.commit()
+    await db.refresh(db_partner)
     return db_partner
 
 
+async def _upsert_partners(db: AsyncSession, company_id: int, partners: List[dict]) -> Tuple[int, int]:
+    """INSERT ... ON CONFLICT по (company_id, partner_inn); возвращает (создано, обновлено)"""
+    stmt = insert(Partner).values([
+        {**partner, "company_id": company_id, "is_connected": False}
+        for partner in partners
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Partner.company_id, Partner.partner_inn],
+        set_={
+            "partner_name": stmt.excluded.partner_name,
+            "partner_email": stmt.excluded.partner_email,
+            "partner_phone": stmt.excluded.partner_phone,
+            "updated_at": func.now(),
+        },
+    ).returning(literal_column("xmax = 0"))
+    result = await db.execute(stmt)
+    inserted = sum(1 for (is_insert,) in result if is_insert)
+    return inserted, len(partners) - inserted
+
+
+@router.post("/import")
+async def import_partners(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Импорт контрагентов из CSV/XLSX (например, выгрузки 1С) с обновлением по ИНН"""
+    file_ext = Path(file.filename).suffix.lower()
+    if file_ext == ".csv":
+        rows = iter_csv_rows(file.file)
+    elif file_ext == ".xlsx":
+        rows = iter_xlsx_rows(file.file)
+    else:
+        raise HTTPException(status_code=400, detail="Поддерживаются файлы .csv и .xlsx")
+    
+    created = updated = failed = 0
+    errors = []
+    
+    # Файл читается пачками; каждая пачка - один upsert и один commit
+    while True:
+        batch = await run_in_threadpool(take, rows, IMPORT_BATCH_SIZE)
+        if not batch:
+            break
+        
+        valid = {}
+        for line_number, row in batch:
+            try:
+                partner = PartnerCreate(**{key: value or None for key, value in row.items()})
+            except (ValidationError, TypeError) as e:
+                failed += 1
+                if len(errors) < IMPORT_MAX_ERRORS:
+                    errors.append({"row": line_number, "error": str(e)})
+                continue
+            # Повтор ИНН внутри пачки: побеждает последняя строка
+            valid[partner.partner_inn] = partner.dict()
+        
+        if valid:
+            batch_created, batch_updated = await _upsert_partners(db, current_user.company_id, list(valid.values()))
+            created += batch_created
+            updated += batch_updated
+            invalidate_after_commit(db, partners_key(current_user.company_id))
+            await db.commit()
+    
+    return {
+        "created": created,
+        "updated": updated,
+        "failed": failed,
+        "errors": errors,
+    }
+
+
 @router.delete("/{partner_id}")
 async def delete_partner(
     partner_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Удаление контрагента"""
-    partner = db.query(Partner).filter(
-        Partner.id == partner_id,
-        Partner.company_id == current_user.company_id
-    ).first()
-    
-    if not partner:
-        raise HTTPException(status_code=404, detail="Контрагент не найден")
+    partner = await _get_own_partner(db, partner_id, current_user.company_id)
     
-    db.delete(partner)
-    db.commit()
+    await db.delete(partner)
+    await db.commit()
     return {"message": "Контрагент удалён"}
-
-
-
@@ -1,130 +1,463 @@
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form
-from sqlalchemy.orm import Session
-from typing import Optional
-from cryptography.hazmat.primitives import serialization
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import and_, select, update, exists, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional, Tuple
 from cryptography.hazmat.primitives.serialization import pkcs12
 from cryptography.hazmat.backends import default_backend
-import hashlib
+import asyncio
 from datetime import datetime
 
-from app.database import get_db
-from app.models import User, Document, Signature
+from app.database import get_async_db
+from app.models import User, Document, DocumentVersion, Signature, Certificate, DocumentStatus, StoredObject
+from app.schemas import SignatureBulkVerifyRequest
 from app.auth import get_current_active_user
+from app.storage import add_reference, hash_stored_file
+from app.metrics import SIGNATURE_LATENCY, observe
+from app.signing import (
+    certificate_issuer,
+    certificate_serial,
+    certificate_pem,
+    sign_digest,
+    verify_executor,
+    verify_signature_rows,
+    signing_sessions,
+)
 
 router = APIRouter()
 
+# Максимум документов в одном пакетном подписании
+SIGN_BATCH_LIMIT = 500
+# Размер пачки подписей, передаваемой в пул проверки
+VERIFY_CHUNK_SIZE = 500
+
+
+def _check_certificate_file(certificate: UploadFile) -> None:
+    """Проверка типа файла сертификата"""
+    if not (certificate.filename.endswith(".p12") or certificate.filename.endswith(".pfx")):
+        raise HTTPException(status_code=400, detail="Недопустимый тип сертификата. Требуется PKCS#12 (.p12, .pfx)")
+
+
+def _load_certificate(cert_data: bytes, password: str):
+    """Разбор PKCS#12 и проверка срока действия сертификата"""
+    try:
+        with observe(SIGNATURE_LATENCY, "pkcs12_load"):
+            private_key, certificate_obj, additional_certificates = pkcs12.load_key_and_certificates(
+                cert_data,
+                password.encode(),
+                backend=default_backend()
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Ошибка обработки сертификата: {str(e)}")
+    
+    if not private_key or not certificate_obj:
+        raise HTTPException(status_code=400, detail="Неверный пароль или повреждённый сертификат")
+    
+    # Проверка срока действия сертификата
+    now = datetime.now()
+    if certificate_obj.not_valid_before > now or certificate_obj.not_valid_after < now:
+        raise HTTPException(status_code=400, detail="Сертификат истёк или ещё не действителен")
+    
+    return private_key, certificate_obj
+
+
+async def _unlock_certificate(certificate: UploadFile, password: str):
+    """Чтение и расшифровка PKCS#12 (CPU-операция выполняется вне event loop)"""
+    _check_certificate_file(certificate)
+    cert_data = await certificate.read()
+    return await run_in_threadpool(_load_certificate, cert_data, password)
+
+
+async def _resolve_signer(
+    session_id: Optional[str],
+    certificate: Optional[UploadFile],
+    password: Optional[str],
+    user_id: int,
+):
+    """Ключ и сертификат: из открытой сессии подписания или из загруженного PKCS#12"""
+    if session_id:
+        session = signing_sessions.get(session_id, user_id)
+        if session is None:
+            raise HTTPException(status_code=401, detail="Сессия подписания истекла или не найдена")
+        return session.private_key, session.certificate
+    if certificate is None or password is None:
+        raise HTTPException(status_code=400, detail="Требуется session_id или сертификат с паролем")
+    return await _unlock_certificate(certificate, password)
+
+
+async def _store_certificate(db: AsyncSession, certificate_obj) -> None:
+    """Сохранение открытой части сертификата для последующей проверки подписей"""
+    await db.execute(
+        insert(Certificate)
+        .values(
+            issuer=certificate_issuer(certificate_obj),
+            serial=certificate_serial(certificate_obj),
+            subject=certificate_obj.subject.rfc4514_string(),
+            certificate_pem=certificate_pem(certificate_obj),
+            not_valid_before=certificate_obj.not_valid_before_utc,
+            not_valid_after=certificate_obj.not_valid_after_utc,
+        )
+        .on_conflict_do_nothing(index_elements=["issuer", "serial"])
+    )
+
+
+async def _document_digests(db: AsyncSession, documents: List[Document], user_id: int) -> Dict[int, str]:
+    """SHA-256 текущих файлов документов.
+
+    Хэш кэшируется в DocumentVersion.hash версии, на которую указывает
+    original_file_path, поэтому повторное подписание не перечитывает файл.
+    Новая загрузка создаёт новую версию, так что устаревший хэш не используется.
+    """
+    with_files = [document for document in documents if document.original_file_path]
+    if not with_files:
+        return {}
+    
+    result = await db.execute(
+        select(DocumentVersion)
+        .where(DocumentVersion.document_id.in_([document.id for document in with_files]))
+        .order_by(DocumentVersion.version_number.desc())
+    )
+    versions = {}
+    for version in result.scalars().all():
+        versions.setdefault((version.document_id, version.file_path), version)
+    
+    digests = {}
+    backfilled = []
+    for document in with_files:
+        version = versions.get((document.id, document.original_file_path))
+        if version is not None and version.hash:
+            digests[document.id] = version.hash
+            continue
+        # Файл читается из хранилища потоково
+        try:
+            digest = await run_in_threadpool(hash_stored_file, document.original_file_path)
+        except Exception as e:
+            print(f"Ошибка чтения файла документа {document.id}: {e}")
+            continue
+        if version is None:
+            version = DocumentVersion(
+                document_id=document.id,
+                version_number=document.version or 1,
+                file_path=document.original_file_path,
+                created_by=user_id,
+            )
+            db.add(version)
+        version.hash = digest
+        digests[document.id] = digest
+        backfilled.append((document.sender_company_id, version.file_path, digest))
+    
+    # Версия без хэша ещё не учтена в ref_count: если её файл - объект
+    # контентно-адресуемого хранилища, ссылка добавляется (освобождается при удалении)
+    if backfilled:
+        result = await db.execute(
+            select(StoredObject.company_id, StoredObject.hash, StoredObject.path).where(
+                tuple_(StoredObject.company_id, StoredObject.hash).in_(
+                    [(company_id, digest) for company_id, _, digest in backfilled]
+                )
+            )
+        )
+        stored_paths = set(result.all())
+        for company_id, file_path, digest in backfilled:
+            if (company_id, digest, file_path) in stored_paths:
+                await add_reference(db, company_id, digest)
+    return digests
+
+
+def _build_signature(document: Document, document_hash: str, signer_id: int, private_key, certificate_obj) -> Signature:
+    """Формирование записи подписи по хэшу документа"""
+    # TODO: подписание по ГОСТ требует отдельного криптопровайдера
+    signature_data = sign_digest(private_key, document_hash)
+    
+    return Signature(
+        document_id=document.id,
+        signer_id=signer_id,
+        certificate_issuer=certificate_issuer(certificate_obj),
+        certificate_serial=certificate_serial(certificate_obj),
+        signature_hash=document_hash,
+        signature_data=signature_data.hex(),
+        is_valid=True,
+    )
+
+
+def _build_signatures(pending: List[Tuple[Document, str]], signer_id: int, private_key, certificate_obj) -> List:
+    """Подписи пачки документов; ошибка подписания возвращается на месте подписи"""
+    built = []
+    for document, document_hash in pending:
+        try:
+            built.append(_build_signature(document, document_hash, signer_id, private_key, certificate_obj))
+        except Exception as e:
+            built.append(e)
+    return built
+
+
+@router.post("/session")
+async def open_signing_session(
+    certificate: UploadFile = File(...),
+    password: str = Form(...),
+    current_user: User = Depends(get_current_active_user),
+):
+    """Открытие сессии подписания: сертификат расшифровывается один раз"""
+    private_key, certificate_obj = await _unlock_certificate(certificate, password)
+    session_id, expires_at = signing_sessions.open(current_user.id, private_key, certificate_obj)
+    return {
+        "session_id": session_id,
+        "expires_at": datetime.fromtimestamp(expires_at),
+        "certificate_subject": certificate_obj.subject.rfc4514_string(),
+    }
+
+
+@router.delete("/session/{session_id}")
+async def close_signing_session(
+    session_id: str,
+    current_user: User = Depends(get_current_active_user),
+):
+    """Закрытие сессии подписания и удаление ключа из памяти"""
+    if not signing_sessions.close(session_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Сессия подписания не найдена")
+    return {"message": "Сессия подписания закрыта"}
+
 
 @router.post("/sign")
 async def sign_document(
     document_id: int = Form(...),
-    certificate: UploadFile = File(...),
-    password: str = Form(...),
+    certificate: Optional[UploadFile] = File(None),
+    password: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Подписание документа электронной подписью"""
     
     # Проверка документа
-    document = db.query(Document).filter(
-        Document.id == document_id,
-        Document.sender_company_id == current_user.company_id
-    ).first()
+    result = await db.execute(
+        select(Document).where(
+            Document.id == document_id,
+            Document.sender_company_id == current_user.company_id
+        )
+    )
+    document = result.scalar_one_or_none()
     
     if not document:
         raise HTTPException(status_code=404, detail="Документ не найден")
     
-    # Проверка типа файла сертификата
-    if not (certificate.filename.endswith(".p12") or certificate.filename.endswith(".pfx")):
-        raise HTTPException(status_code=400, detail="Недопустимый тип сертификата. Требуется PKCS#12 (.p12, .pfx)")
+    if not document.original_file_path:
+        raise HTTPException(status_code=400, detail="К документу не загружен файл")
+    
+    private_key, certificate_obj = await _resolve_signer(session_id, certificate, password, current_user.id)
     
     try:
-        # Чтение PKCS#12 сертификата
-        cert_data = await certificate.read()
-        
-        # Загрузка сертификата
-        private_key, certificate_obj, additional_certificates = pkcs12.load_key_and_certificates(
-            cert_data,
-            password.encode(),
-            backend=default_backend()
-        )
-        
-        if not private_key or not certificate_obj:
-            raise HTTPException(status_code=400, detail="Неверный пароль или повреждённый сертификат")
-        
-        # Проверка срока действия сертификата
-        now = datetime.now()
-        if certificate_obj.not_valid_before > now or certificate_obj.not_valid_after < now:
-            raise HTTPException(status_code=400, detail="Сертификат истёк или ещё не действителен")
-        
-        # Получение данных документа для подписи
-        # TODO: Загрузить файл документа и вычислить хэш
-        document_content = b""  # Здесь должен быть контент документа
-        
-        # Генерация хэша документа
-        document_hash = hashlib.sha256(document_content).hexdigest()
-        
-        # Подписание хэша (упрощённая версия)
-        # В реальности здесь должна быть полная логика подписания по ГОСТ
-        # signature_data = private_key.sign(document_hash.encode(), padding=..., algorithm=...)
-        signature_data = b"mock_signature"  # TODO: Реальная подпись
-        
-        # Сохранение подписи в БД
-        signature = Signature(
-            document_id=document_id,
-            signer_id=current_user.id,
-            certificate_serial=certificate_obj.serial_number.to_bytes(20, 'big').hex(),
-            signature_hash=document_hash,
-            signature_data=signature_data.hex(),
-            is_valid=True,
+        digests = await _document_digests(db, [document], current_user.id)
+        if document.id not in digests:
+            raise ValueError("не удалось прочитать файл документа")
+        signature = await run_in_threadpool(
+            _build_signature, document, digests[document.id], current_user.id, private_key, certificate_obj
         )
-        
+        await _store_certificate(db, certificate_obj)
         db.add(signature)
         
         # Обновление статуса документа
-        from app.models import DocumentStatus
         if document.status != DocumentStatus.SIGNED:
             document.status = DocumentStatus.SIGNED
         
-        db.commit()
-        db.refresh(signature)
+        await db.commit()
+        await db.refresh(signature)
         
         return {
             "message": "Документ успешно подписан",
             "signature_id": signature.id,
-            "document_hash": document_hash,
+            "document_hash": signature.signature_hash,
             "certificate_subject": certificate_obj.subject.rfc4514_string(),
         }
         
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=f"Ошибка обработки сертификата: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка подписания документа: {str(e)}")
 
 
+@router.post("/sign/batch")
+async def sign_documents_batch(
+    document_ids: List[int] = Form(...),
+    certificate: Optional[UploadFile] = File(None),
+    password: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Пакетное подписание: сертификат расшифровывается один раз на весь список"""
+    
+    # Порядок сохраняется, повторы отбрасываются
+    document_ids = list(dict.fromkeys(document_ids))
+    if len(document_ids) > SIGN_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"Не более {SIGN_BATCH_LIMIT} документов за раз")
+    
+    private_key, certificate_obj = await _resolve_signer(session_id, certificate, password, current_user.id)
+    
+    # Все документы одним запросом
+    result = await db.execute(
+        select(Document).where(
+            Document.id.in_(document_ids),
+            Document.sender_company_id == current_user.company_id
+        )
+    )
+    documents = {document.id: document for document in result.scalars().all()}
+    digests = await _document_digests(db, list(documents.values()), current_user.id)
+    
+    results = []
+    pending = []
+    for document_id in document_ids:
+        document = documents.get(document_id)
+        if not document:
+            results.append({"document_id": document_id, "success": False, "error": "Документ не найден"})
+            continue
+        if not document.original_file_path:
+            results.append({"document_id": document_id, "success": False, "error": "К документу не загружен файл"})
+            continue
+        if document_id not in digests:
+            results.append({"document_id": document_id, "success": False, "error": "Не удалось прочитать файл документа"})
+            continue
+        item = {"document_id": document_id}
+        results.append(item)
+        pending.append((item, document, digests[document_id]))
+    
+    # Подпись до SIGN_BATCH_LIMIT документов - CPU-работа, выполняется вне event loop
+    built = await run_in_threadpool(
+        _build_signatures,
+        [(document, digest) for _, document, digest in pending],
+        current_user.id,
+        private_key,
+        certificate_obj,
+    )
+    signatures = []
+    for (item, _, _), signature in zip(pending, built):
+        if isinstance(signature, Exception):
+            item.update(success=False, error=f"Ошибка подписания документа: {str(signature)}")
+            continue
+        signatures.append(signature)
+        item.update(success=True, signature=signature)
+    
+    if signatures:
+        # Подписи и статусы записываются пачкой в одной транзакции
+        await _store_certificate(db, certificate_obj)
+        db.add_all(signatures)
+        await db.flush()
+        await db.execute(
+            update(Document)
+            .where(
+                Document.id.in_([signature.document_id for signature in signatures]),
+                Document.status != DocumentStatus.SIGNED
+            )
+            .values(status=DocumentStatus.SIGNED)
+            .execution_options(synchronize_session=False)
+        )
+    # Фиксируются и подписи, и вычисленные хэши версий
+    await db.commit()
+    
+    for item in results:
+        signature = item.pop("signature", None)
+        if signature is not None:
+            item["signature_id"] = signature.id
+            item["document_hash"] = signature.signature_hash
+    
+    return {
+        "signed": len(signatures),
+        "failed": len(results) - len(signatures),
+        "certificate_subject": certificate_obj.subject.rfc4514_string(),
+        "results": results,
+    }
+
+
+def _verification_query(company_id: int):
+    """Выборка подписей с сертификатом и признаком совпадения хэша с версией документа"""
+    hash_matches = exists().where(
+        DocumentVersion.document_id == Signature.document_id,
+        DocumentVersion.hash == Signature.signature_hash,
+    )
+    return (
+        select(
+            Signature.id,
+            Signature.document_id,
+            Signature.signature_hash,
+            Signature.signature_data,
+            Signature.certificate_issuer,
+            Signature.certificate_serial,
+            Signature.signed_at,
+            Certificate.certificate_pem,
+            hash_matches.label("hash_matches"),
+        )
+        .join(Document, Document.id == Signature.document_id)
+        .outerjoin(
+            Certificate,
+            and_(
+                Certificate.issuer == Signature.certificate_issuer,
+                Certificate.serial == Signature.certificate_serial,
+            ),
+        )
+        .where(
+            (Document.sender_company_id == company_id) |
+            (Document.receiver_company_id == company_id)
+        )
+    )
+
+
+@router.post("/verify/bulk")
+async def verify_signatures_bulk(
+    request: SignatureBulkVerifyRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Массовая проверка подписей за период (для аудита)"""
+    query = _verification_query(current_user.company_id)
+    if request.date_from:
+        query = query.where(Signature.signed_at >= request.date_from)
+    if request.date_to:
+        query = query.where(Signature.signed_at <= request.date_to)
+    if request.document_ids:
+        query = query.where(Signature.document_id.in_(request.document_ids))
+    query = query.order_by(Signature.id).execution_options(yield_per=VERIFY_CHUNK_SIZE)
+    
+    # Строки читаются потоково, пачки проверяются параллельно в пуле;
+    # результаты проверки сертификатов кэшируются по издателю и серийному номеру
+    loop = asyncio.get_running_loop()
+    futures = []
+    result = await db.stream(query)
+    async for partition in result.partitions(VERIFY_CHUNK_SIZE):
+        rows = [tuple(row) for row in partition]
+        futures.append(loop.run_in_executor(verify_executor, verify_signature_rows, rows))
+    
+    results = [item for chunk in await asyncio.gather(*futures) for item in chunk]
+    valid = sum(1 for item in results if item["is_valid"])
+    return {
+        "total": len(results),
+        "valid": valid,
+        "invalid": len(results) - valid,
+        "results": results,
+    }
+
+
 @router.get("/verify/{signature_id}")
 async def verify_signature(
     signature_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Проверка валидности подписи"""
     
-    signature = db.query(Signature).filter(
-        Signature.id == signature_id
-    ).first()
+    result = await db.execute(
+        _verification_query(current_user.company_id).where(Signature.id == signature_id)
+    )
+    row = result.first()
     
-    if not signature:
+    if not row:
         raise HTTPException(status_code=404, detail="Подпись не найдена")
     
-    # TODO: Реальная проверка подписи по ГОСТ
-    # Проверка цепочки сертификатов, CRL, OCSP и т.д.
+    # TODO: Проверка отзыва сертификата (CRL, OCSP)
+    verification = (await run_in_threadpool(verify_signature_rows, [tuple(row)]))[0]
     
     return {
-        "signature_id": signature.id,
-        "is_valid": signature.is_valid,
-        "signed_at": signature.signed_at,
-        "certificate_serial": signature.certificate_serial,
+        "signature_id": row.id,
+        "is_valid": verification["is_valid"],
+        "signed_at": row.signed_at,
+        "certificate_serial": row.certificate_serial,
+        "chain_verified": verification["chain_verified"],
+        "error": verification["error"],
     }
-
-
-
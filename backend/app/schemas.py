@@ -1,7 +1,7 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
-from typing import Optional, List
-from app.models import DocumentStatus, DocumentType, UserRole
+from typing import Optional, List, Any, Dict
+from app.models import DocumentStatus, DocumentType, UserRole, JobStatus
 
 
 # Auth schemas
@@ -111,6 +111,14 @@ class DocumentUpdate(BaseModel):
     nds: Optional[float] = None
 
 
+class DocumentBulkIdsRequest(BaseModel):
+    document_ids: List[int]
+
+
+class DocumentBulkStatusRequest(DocumentBulkIdsRequest):
+    status: DocumentStatus
+
+
 class DocumentResponse(DocumentBase):
     id: int
     status: DocumentStatus
@@ -127,6 +135,29 @@ class DocumentResponse(DocumentBase):
         from_attributes = True
 
 
+class DocumentStatsBucket(BaseModel):
+    count: int = 0
+    amount: float = 0
+    nds: float = 0
+
+
+class DocumentStatsResponse(DocumentStatsBucket):
+    by_status: Dict[DocumentStatus, DocumentStatsBucket] = {}
+    by_type: Dict[DocumentType, DocumentStatsBucket] = {}
+
+
+class DocumentVersionResponse(BaseModel):
+    id: int
+    version_number: int
+    file_path: str
+    hash: Optional[str] = None
+    created_by: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 # Partner schemas
 class PartnerBase(BaseModel):
     partner_name: str
@@ -136,7 +167,11 @@ class PartnerBase(BaseModel):
 
 
 class PartnerCreate(PartnerBase):
-    pass
+    # Длины колонок partners: иначе ошибка возникает только в БД (500 посреди импорта)
+    partner_name: str = Field(max_length=255)
+    partner_inn: str = Field(max_length=20)
+    partner_email: Optional[EmailStr] = Field(None, max_length=255)
+    partner_phone: Optional[str] = Field(None, max_length=50)
 
 
 class PartnerResponse(PartnerBase):
@@ -164,6 +199,12 @@ class SignatureResponse(BaseModel):
         from_attributes = True
 
 
+class SignatureBulkVerifyRequest(BaseModel):
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    document_ids: Optional[List[int]] = None
+
+
 # Comment schemas
 class CommentCreate(BaseModel):
     text: str
@@ -181,4 +222,25 @@ class CommentResponse(BaseModel):
         from_attributes = True
 
 
+# Job schemas
+class JobResponse(BaseModel):
+    id: str
+    status: JobStatus
+    stored_object_id: int
+    document_id: Optional[int] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 
+# Документ со связанными сущностями (?expand=...); не запрошенные поля не выводятся
+class DocumentExpandedResponse(DocumentResponse):
+    signatures: Optional[List[SignatureResponse]] = None
+    versions: Optional[List[DocumentVersionResponse]] = None
+    comments: Optional[List[CommentResponse]] = None
+    sender_company: Optional[CompanyResponse] = None
+    receiver_company: Optional[CompanyResponse] = None
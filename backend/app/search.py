@@ -0,0 +1,57 @@
+import os
+
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+load_dotenv()
+
+# Конфигурация полнотекстового поиска PostgreSQL
+SEARCH_CONFIG = os.getenv("SEARCH_CONFIG", "russian")
+# Сколько символов извлечённого текста попадает в индекс (tsvector ограничен 1 МБ)
+SEARCH_MAX_TEXT = int(os.getenv("SEARCH_MAX_TEXT", "200000"))
+
+# Вес A - номер документа, B - наименование контрагента, C - текст файла
+_REFRESH_SQL = f"""
+UPDATE documents AS d SET search_vector =
+    setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(src.number, '')), 'A') ||
+    setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(c.name, '')), 'B') ||
+    setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(left(so.extracted_text, :max_text), '')), 'C')
+FROM documents AS src
+LEFT JOIN companies AS c ON c.id = src.receiver_company_id
+LEFT JOIN stored_objects AS so
+    ON so.company_id = src.sender_company_id AND so.path = src.original_file_path
+WHERE d.id = src.id AND {{condition}}
+"""
+
+_BY_IDS = text(_REFRESH_SQL.format(condition="src.id IN :ids")).bindparams(
+    bindparam("ids", expanding=True)
+)
+_BY_RECEIVER = text(_REFRESH_SQL.format(condition="src.receiver_company_id = :company_id"))
+_ALL = text(_REFRESH_SQL.format(condition="TRUE"))
+_BY_FILE = text(_REFRESH_SQL.format(
+    condition="src.sender_company_id = :company_id AND src.original_file_path = :path"
+))
+
+
+def rebuild_document_search(db: Session) -> None:
+    """Пересчёт поисковых векторов всех документов (миграция, смена SEARCH_CONFIG)"""
+    db.execute(_ALL, {"max_text": SEARCH_MAX_TEXT})
+
+
+async def refresh_document_search(db: AsyncSession, document_ids) -> None:
+    """Пересчёт поискового вектора документов (в текущей транзакции)"""
+    document_ids = list(document_ids)
+    if document_ids:
+        await db.execute(_BY_IDS, {"ids": document_ids, "max_text": SEARCH_MAX_TEXT})
+
+
+async def refresh_received_documents_search(db: AsyncSession, company_id: int) -> None:
+    """Пересчёт после изменения наименования компании-получателя"""
+    await db.execute(_BY_RECEIVER, {"company_id": company_id, "max_text": SEARCH_MAX_TEXT})
+
+
+def refresh_file_documents_search(db: Session, company_id: int, path: str) -> None:
+    """Пересчёт документов, ссылающихся на файл, после извлечения текста (воркер)"""
+    db.execute(_BY_FILE, {"company_id": company_id, "path": path, "max_text": SEARCH_MAX_TEXT})
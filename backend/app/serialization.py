@@ -0,0 +1,41 @@
+from typing import Any, List, Optional
+
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+
+from app.schemas import DocumentResponse, DocumentExpandedResponse, PartnerResponse
+
+# Ответ по умолчанию для всех роутов (app/main.py)
+DefaultResponse = ORJSONResponse
+
+# Адаптеры списков собираются один раз при импорте: валидация ORM-объектов
+# и сериализация в JSON выполняются в pydantic-core, минуя jsonable_encoder
+document_list = TypeAdapter(List[DocumentResponse])
+document_expanded_list = TypeAdapter(List[DocumentExpandedResponse])
+partner_list = TypeAdapter(List[PartnerResponse])
+
+
+def dump_list(adapter: TypeAdapter, items: List[Any], exclude_unset: bool = False) -> bytes:
+    """JSON списка (ORM-объекты или модели) через адаптер"""
+    return adapter.dump_json(
+        adapter.validate_python(items, from_attributes=True),
+        exclude_unset=exclude_unset,
+    )
+
+
+def list_response(
+    adapter: TypeAdapter,
+    items: List[Any],
+    response: Optional[Response] = None,
+    exclude_unset: bool = False,
+) -> Response:
+    """Готовый JSON-ответ со списком; заголовки из response (X-Next-Cursor) переносятся"""
+    headers = dict(response.headers) if response is not None else None
+    if headers:
+        headers.pop("content-length", None)
+    return Response(
+        content=dump_list(adapter, items, exclude_unset),
+        media_type="application/json",
+        headers=headers,
+    )
@@ -0,0 +1,300 @@
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, padding, rsa, utils
+from dotenv import load_dotenv
+
+from app.metrics import SIGNATURE_LATENCY, observe
+
+load_dotenv()
+
+# Время жизни результата проверки сертификата (цепочка, разбор PEM)
+CERT_VERIFY_CACHE_TTL = int(os.getenv("CERT_VERIFY_CACHE_TTL", "3600"))
+CERT_VERIFY_CACHE_MAXSIZE = int(os.getenv("CERT_VERIFY_CACHE_MAXSIZE", "10000"))
+# Пул для массовой проверки подписей
+VERIFY_WORKERS = int(os.getenv("VERIFY_WORKERS", str(os.cpu_count() or 4)))
+# Сессии подписания: время жизни расшифрованного ключа и максимум сессий
+SIGNING_SESSION_TTL = int(os.getenv("SIGNING_SESSION_TTL", "900"))
+SIGNING_SESSION_MAXSIZE = int(os.getenv("SIGNING_SESSION_MAXSIZE", "1000"))
+# Максимум открытых сессий одного пользователя: сверх него вытесняются его же сессии
+SIGNING_SESSION_MAX_PER_USER = int(os.getenv("SIGNING_SESSION_MAX_PER_USER", "5"))
+# PEM-файл с доверенными корневыми/промежуточными сертификатами УЦ
+TRUSTED_CA_FILE = os.getenv("TRUSTED_CA_FILE")
+
+verify_executor = ThreadPoolExecutor(max_workers=VERIFY_WORKERS, thread_name_prefix="verify")
+
+
+def _load_trusted_cas() -> List[x509.Certificate]:
+    if not TRUSTED_CA_FILE:
+        return []
+    with open(TRUSTED_CA_FILE, "rb") as f:
+        return x509.load_pem_x509_certificates(f.read())
+
+
+trusted_cas = _load_trusted_cas()
+
+
+def certificate_serial(certificate_obj: x509.Certificate) -> str:
+    return certificate_obj.serial_number.to_bytes(20, 'big').hex()
+
+
+def certificate_issuer(certificate_obj: x509.Certificate) -> str:
+    return certificate_obj.issuer.rfc4514_string()
+
+
+def certificate_pem(certificate_obj: x509.Certificate) -> str:
+    return certificate_obj.public_bytes(serialization.Encoding.PEM).decode()
+
+
+def sign_digest(private_key, document_hash: str) -> bytes:
+    """Подпись SHA-256 хэша документа закрытым ключом сертификата.
+
+    Поддерживаются ключи RSA, EC и Ed25519 (ГОСТ-ключи требуют отдельного
+    криптопровайдера).
+    """
+    digest = bytes.fromhex(document_hash)
+    with observe(SIGNATURE_LATENCY, "sign"):
+        if isinstance(private_key, rsa.RSAPrivateKey):
+            return private_key.sign(digest, padding.PKCS1v15(), utils.Prehashed(hashes.SHA256()))
+        if isinstance(private_key, ec.EllipticCurvePrivateKey):
+            return private_key.sign(digest, ec.ECDSA(utils.Prehashed(hashes.SHA256())))
+        if isinstance(private_key, ed25519.Ed25519PrivateKey):
+            return private_key.sign(digest)
+    raise ValueError("Неподдерживаемый тип ключа")
+
+
+def verify_digest(public_key, document_hash: str, signature_data: bytes) -> bool:
+    """Криптографическая проверка подписи хэша"""
+    digest = bytes.fromhex(document_hash)
+    with observe(SIGNATURE_LATENCY, "verify"):
+        try:
+            if isinstance(public_key, rsa.RSAPublicKey):
+                public_key.verify(signature_data, digest, padding.PKCS1v15(), utils.Prehashed(hashes.SHA256()))
+            elif isinstance(public_key, ec.EllipticCurvePublicKey):
+                public_key.verify(signature_data, digest, ec.ECDSA(utils.Prehashed(hashes.SHA256())))
+            elif isinstance(public_key, ed25519.Ed25519PublicKey):
+                public_key.verify(signature_data, digest)
+            else:
+                return False
+        except InvalidSignature:
+            return False
+    return True
+
+
+class CertificateInfo:
+    """Результат разбора и проверки цепочки сертификата"""
+
+    __slots__ = ("public_key", "not_valid_before", "not_valid_after", "chain_verified", "error")
+
+    def __init__(self, public_key=None, not_valid_before=None, not_valid_after=None,
+                 chain_verified: Optional[bool] = None, error: Optional[str] = None):
+        self.public_key = public_key
+        self.not_valid_before = not_valid_before
+        self.not_valid_after = not_valid_after
+        self.chain_verified = chain_verified
+        self.error = error
+
+
+def _check_chain(certificate_obj: x509.Certificate) -> Optional[bool]:
+    """Проверка, что сертификат выпущен доверенным УЦ; None — хранилище УЦ не настроено"""
+    if not trusted_cas:
+        return None
+    for ca in trusted_cas:
+        if ca.subject != certificate_obj.issuer:
+            continue
+        try:
+            certificate_obj.verify_directly_issued_by(ca)
+            return True
+        except (ValueError, TypeError, InvalidSignature):
+            continue
+    return False
+
+
+def _inspect_certificate(pem: str) -> CertificateInfo:
+    try:
+        certificate_obj = x509.load_pem_x509_certificate(pem.encode())
+    except ValueError as e:
+        return CertificateInfo(error=f"Повреждённый сертификат: {e}")
+    chain_verified = _check_chain(certificate_obj)
+    return CertificateInfo(
+        public_key=certificate_obj.public_key(),
+        not_valid_before=certificate_obj.not_valid_before_utc,
+        not_valid_after=certificate_obj.not_valid_after_utc,
+        chain_verified=chain_verified,
+        error="Сертификат не выпущен доверенным УЦ" if chain_verified is False else None,
+    )
+
+
+class CertificateCache:
+    """Кэш проверок сертификатов по издателю и серийному номеру с истечением срока"""
+
+    def __init__(self, ttl: int, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: Dict[Tuple[str, str], Tuple[float, CertificateInfo]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, issuer: str, serial: str, pem: str) -> CertificateInfo:
+        key = (issuer, serial)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+        info = _inspect_certificate(pem)
+        with self._lock:
+            if len(self._data) >= self.maxsize:
+                self._data = {k: v for k, v in self._data.items() if v[0] > now}
+                if len(self._data) >= self.maxsize:
+                    self._data.clear()
+            self._data[key] = (now + self.ttl, info)
+        return info
+
+
+certificate_cache = CertificateCache(CERT_VERIFY_CACHE_TTL, CERT_VERIFY_CACHE_MAXSIZE)
+
+
+def verify_signature_row(
+    signature_id: int,
+    document_id: int,
+    signature_hash: Optional[str],
+    signature_data: Optional[str],
+    issuer: Optional[str],
+    serial: Optional[str],
+    signed_at: Optional[datetime],
+    pem: Optional[str],
+    hash_matches: bool,
+) -> dict:
+    """Полная проверка одной подписи"""
+    result = {
+        "signature_id": signature_id,
+        "document_id": document_id,
+        "certificate_serial": serial,
+        "is_valid": False,
+        "chain_verified": None,
+        "error": None,
+    }
+    if not pem or not issuer or not serial:
+        result["error"] = "Сертификат подписанта не сохранён"
+        return result
+    if not signature_hash or not signature_data:
+        result["error"] = "Нет данных подписи"
+        return result
+
+    info = certificate_cache.get(issuer, serial, pem)
+    result["chain_verified"] = info.chain_verified
+    if info.error:
+        result["error"] = info.error
+        return result
+    if signed_at and not (info.not_valid_before <= signed_at <= info.not_valid_after):
+        result["error"] = "Сертификат не действовал на момент подписания"
+        return result
+    try:
+        signature_bytes = bytes.fromhex(signature_data)
+        valid = verify_digest(info.public_key, signature_hash, signature_bytes)
+    except ValueError:
+        valid = False
+    if not valid:
+        result["error"] = "Подпись не соответствует хэшу документа"
+        return result
+    if not hash_matches:
+        result["error"] = "Хэш не совпадает ни с одной версией документа"
+        return result
+    result["is_valid"] = True
+    return result
+
+
+def verify_signature_rows(rows: List[tuple]) -> List[dict]:
+    """Проверка пачки подписей (выполняется в verify_executor)"""
+    return [verify_signature_row(*row) for row in rows]
+
+
+class SigningSession:
+    __slots__ = ("user_id", "expires_at", "private_key", "certificate")
+
+    def __init__(self, user_id: int, expires_at: float, private_key, certificate):
+        self.user_id = user_id
+        self.expires_at = expires_at
+        self.private_key = private_key
+        self.certificate = certificate
+
+
+class SigningSessionStore:
+    """Хранилище расшифрованных ключей в памяти процесса с TTL.
+
+    Ключ живёт только в памяти воркера, создавшего сессию, и удаляется
+    по истечении TTL, явному закрытию сессии или выходу пользователя.
+    Расшифрованный ключ намеренно не выносится во внешнее хранилище,
+    поэтому при нескольких воркерах запросы подписания должны попадать
+    в воркер, открывший сессию (см. README).
+    """
+
+    def __init__(self, ttl: int, maxsize: int, max_per_user: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.max_per_user = max_per_user
+        self._sessions: Dict[str, SigningSession] = {}
+        self._lock = threading.Lock()
+
+    def _purge_expired(self, now: float) -> None:
+        for session_id in [k for k, v in self._sessions.items() if v.expires_at <= now]:
+            del self._sessions[session_id]
+
+    def open(self, user_id: int, private_key, certificate) -> Tuple[str, float]:
+        now = time.monotonic()
+        session_id = secrets.token_urlsafe(32)
+        with self._lock:
+            self._purge_expired(now)
+            # Сначала вытесняются сессии самого пользователя: он не может
+            # занять всё хранилище и вытеснить сессии других пользователей
+            own = sorted(
+                (k for k, v in self._sessions.items() if v.user_id == user_id),
+                key=lambda k: self._sessions[k].expires_at,
+            )
+            for evicted in own[:max(len(own) - self.max_per_user + 1, 0)]:
+                del self._sessions[evicted]
+            while len(self._sessions) >= self.maxsize:
+                # Вытесняется сессия, которая истекает раньше всех
+                oldest = min(self._sessions, key=lambda k: self._sessions[k].expires_at)
+                del self._sessions[oldest]
+            self._sessions[session_id] = SigningSession(user_id, now + self.ttl, private_key, certificate)
+        return session_id, time.time() + self.ttl
+
+    def get(self, session_id: str, user_id: int) -> Optional[SigningSession]:
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if session.expires_at <= now:
+                del self._sessions[session_id]
+                return None
+            if session.user_id != user_id:
+                return None
+            return session
+
+    def close(self, session_id: str, user_id: int) -> bool:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.user_id != user_id:
+                return False
+            del self._sessions[session_id]
+            return True
+
+    def close_user(self, user_id: int) -> int:
+        with self._lock:
+            session_ids = [k for k, v in self._sessions.items() if v.user_id == user_id]
+            for session_id in session_ids:
+                del self._sessions[session_id]
+            return len(session_ids)
+
+
+signing_sessions = SigningSessionStore(SIGNING_SESSION_TTL, SIGNING_SESSION_MAXSIZE, SIGNING_SESSION_MAX_PER_USER)
@@ -0,0 +1,106 @@
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Счётчики реестра (document_stats) ведутся триггером в той же транзакции,
+# что и изменение документа: вставки, смены статуса/типа/сумм, удаления,
+# включая массовые UPDATE/DELETE мимо ORM. Документ учитывается у
+# отправителя (outgoing) и у получателя (incoming), если это другая компания
+STATS_FUNCTIONS_DDL = """
+CREATE OR REPLACE FUNCTION document_stats_bump(
+    p_company integer, p_direction varchar, p_status documentstatus,
+    p_type documenttype, p_count integer, p_amount numeric, p_nds numeric
+) RETURNS void AS $$
+BEGIN
+    IF p_company IS NULL THEN
+        RETURN;
+    END IF;
+    INSERT INTO document_stats (company_id, direction, status, document_type, count, amount, nds)
+    VALUES (
+        p_company, p_direction, coalesce(p_status, 'DRAFT'), p_type,
+        p_count, coalesce(p_amount, 0), coalesce(p_nds, 0)
+    )
+    ON CONFLICT (company_id, direction, status, document_type) DO UPDATE SET
+        count = document_stats.count + EXCLUDED.count,
+        amount = document_stats.amount + EXCLUDED.amount,
+        nds = document_stats.nds + EXCLUDED.nds;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION documents_stats_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND
+        (OLD.status, OLD.document_type, OLD.amount, OLD.nds, OLD.sender_company_id, OLD.receiver_company_id)
+        IS NOT DISTINCT FROM
+        (NEW.status, NEW.document_type, NEW.amount, NEW.nds, NEW.sender_company_id, NEW.receiver_company_id)
+    THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM document_stats_bump(
+            OLD.sender_company_id, 'outgoing', OLD.status, OLD.document_type, -1, -OLD.amount, -OLD.nds
+        );
+        IF OLD.receiver_company_id IS DISTINCT FROM OLD.sender_company_id THEN
+            PERFORM document_stats_bump(
+                OLD.receiver_company_id, 'incoming', OLD.status, OLD.document_type, -1, -OLD.amount, -OLD.nds
+            );
+        END IF;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM document_stats_bump(
+            NEW.sender_company_id, 'outgoing', NEW.status, NEW.document_type, 1, NEW.amount, NEW.nds
+        );
+        IF NEW.receiver_company_id IS DISTINCT FROM NEW.sender_company_id THEN
+            PERFORM document_stats_bump(
+                NEW.receiver_company_id, 'incoming', NEW.status, NEW.document_type, 1, NEW.amount, NEW.nds
+            );
+        END IF;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+STATS_TRIGGER_DDL = """
+CREATE OR REPLACE TRIGGER documents_stats
+AFTER INSERT OR DELETE OR UPDATE OF
+    status, document_type, amount, nds, sender_company_id, receiver_company_id
+ON documents
+FOR EACH ROW EXECUTE FUNCTION documents_stats_trigger()
+"""
+
+_REBUILD_SQL = """
+INSERT INTO document_stats (company_id, direction, status, document_type, count, amount, nds)
+SELECT company_id, direction, status, document_type, count(*), coalesce(sum(amount), 0), coalesce(sum(nds), 0)
+FROM (
+    SELECT sender_company_id AS company_id, 'outgoing' AS direction,
+        coalesce(status, 'DRAFT') AS status, document_type, amount, nds
+    FROM documents
+    UNION ALL
+    SELECT receiver_company_id, 'incoming', coalesce(status, 'DRAFT'), document_type, amount, nds
+    FROM documents
+    WHERE receiver_company_id IS NOT NULL AND receiver_company_id <> sender_company_id
+) AS src
+WHERE {condition}
+GROUP BY company_id, direction, status, document_type
+"""
+
+_DELETE_ALL = text("DELETE FROM document_stats")
+_DELETE_COMPANY = text("DELETE FROM document_stats WHERE company_id = :company_id")
+_REBUILD_ALL = text(_REBUILD_SQL.format(condition="TRUE"))
+_REBUILD_COMPANY = text(_REBUILD_SQL.format(condition="company_id = :company_id"))
+
+
+def rebuild_document_stats(db: Session, company_id: Optional[int] = None) -> None:
+    """Пересчёт счётчиков с нуля по таблице documents (в текущей транзакции).
+
+    DELETE блокирует строки счётчиков, поэтому параллельные изменения
+    документов дожидаются commit и добавляют свои дельты уже к новым значениям.
+    """
+    if company_id is None:
+        db.execute(_DELETE_ALL)
+        db.execute(_REBUILD_ALL)
+    else:
+        db.execute(_DELETE_COMPANY, {"company_id": company_id})
+        db.execute(_REBUILD_COMPANY, {"company_id": company_id})
@@ -0,0 +1,317 @@
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+from minio import Minio
+from minio.error import S3Error
+from sqlalchemy import exists, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.models import StoredObject
+from app.metrics import MINIO_BYTES, MINIO_LATENCY, observe
+
+load_dotenv()
+
+# MinIO конфигурация
+MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "localhost:9000")
+MINIO_ACCESS_KEY = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
+MINIO_SECRET_KEY = os.getenv("MINIO_SECRET_KEY", "minioadmin")
+MINIO_BUCKET = os.getenv("MINIO_BUCKET", "edo-documents")
+MINIO_USE_SSL = os.getenv("MINIO_USE_SSL", "false").lower() == "true"
+
+# Инициализация MinIO клиента
+try:
+    minio_client = Minio(
+        MINIO_ENDPOINT,
+        access_key=MINIO_ACCESS_KEY,
+        secret_key=MINIO_SECRET_KEY,
+        secure=MINIO_USE_SSL
+    )
+    
+    # Создание bucket если не существует
+    if not minio_client.bucket_exists(MINIO_BUCKET):
+        minio_client.make_bucket(MINIO_BUCKET)
+        print(f"Bucket '{MINIO_BUCKET}' создан")
+except Exception as e:
+    print(f"Ошибка инициализации MinIO: {e}")
+    minio_client = None
+
+# Fallback: локальная директория для загрузки файлов
+UPLOAD_DIR = Path("uploads")
+UPLOAD_DIR.mkdir(exist_ok=True)
+
+# Размер блока при потоковой обработке файлов
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# Размер части multipart-загрузки в MinIO (минимум 5 МБ)
+MINIO_PART_SIZE = max(int(os.getenv("MINIO_PART_SIZE", str(10 * 1024 * 1024))), 5 * 1024 * 1024)
+
+
+class HashingReader:
+    """Обёртка над файлом: считает SHA-256 и размер по мере чтения"""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._fileobj.read(size)
+        self.sha256.update(chunk)
+        self.size += len(chunk)
+        return chunk
+
+
+def hash_stream(fileobj) -> Tuple[str, int]:
+    """SHA-256 и размер файла, читаемого блоками по UPLOAD_CHUNK_SIZE"""
+    reader = HashingReader(fileobj)
+    while reader.read(UPLOAD_CHUNK_SIZE):
+        pass
+    return reader.sha256.hexdigest(), reader.size
+
+
+def put_to_minio(fileobj, object_name: str, content_type: str) -> Tuple[str, int]:
+    """Multipart-загрузка в MinIO частями по MINIO_PART_SIZE"""
+    reader = HashingReader(fileobj)
+    with observe(MINIO_LATENCY, "put"):
+        minio_client.put_object(
+            MINIO_BUCKET,
+            object_name,
+            reader,
+            length=-1,
+            part_size=MINIO_PART_SIZE,
+            content_type=content_type,
+        )
+    MINIO_BYTES.labels(operation="put").inc(reader.size)
+    return reader.sha256.hexdigest(), reader.size
+
+
+def write_local(fileobj, path: Path) -> Tuple[str, int]:
+    """Запись в локальное хранилище блоками по UPLOAD_CHUNK_SIZE"""
+    reader = HashingReader(fileobj)
+    with open(path, "wb") as buffer:
+        while True:
+            chunk = reader.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            buffer.write(chunk)
+    return reader.sha256.hexdigest(), reader.size
+
+
+def iter_minio_object(object_name: str, offset: int = 0, length: int = 0):
+    """Проксирование объекта MinIO блоками без буферизации целиком"""
+    with observe(MINIO_LATENCY, "get"):
+        response = minio_client.get_object(MINIO_BUCKET, object_name, offset=offset, length=length)
+    transferred = MINIO_BYTES.labels(operation="get")
+    try:
+        for chunk in response.stream(UPLOAD_CHUNK_SIZE):
+            transferred.inc(len(chunk))
+            yield chunk
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def iter_local_file(path: Path, offset: int = 0, length: Optional[int] = None):
+    """Чтение локального файла блоками в пределах диапазона"""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        remaining = length
+        while remaining is None or remaining > 0:
+            size = UPLOAD_CHUNK_SIZE if remaining is None else min(UPLOAD_CHUNK_SIZE, remaining)
+            chunk = f.read(size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+def iter_stored_file(file_path: str):
+    """Чтение файла по пути, сохранённому в БД (MinIO или локально), блоками"""
+    prefix = f"{MINIO_BUCKET}/"
+    if minio_client and file_path.startswith(prefix):
+        return iter_minio_object(file_path[len(prefix):])
+    return iter_local_file(Path(file_path))
+
+
+def hash_stored_file(file_path: str) -> str:
+    """SHA-256 сохранённого файла без загрузки его в память целиком"""
+    sha256 = hashlib.sha256()
+    for chunk in iter_stored_file(file_path):
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+@contextmanager
+def local_copy(file_path: str):
+    """Локальный путь к сохранённому файлу (объект MinIO копируется во временный файл блоками)"""
+    prefix = f"{MINIO_BUCKET}/"
+    if not (minio_client and file_path.startswith(prefix)):
+        yield file_path
+        return
+    fd, tmp_path = tempfile.mkstemp(suffix=Path(file_path).suffix)
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            for chunk in iter_minio_object(file_path[len(prefix):]):
+                tmp.write(chunk)
+        yield tmp_path
+    finally:
+        Path(tmp_path).unlink(missing_ok=True)
+
+
+def remove_file(file_path: str) -> None:
+    """Удаление файла по пути, сохранённому в БД (MinIO или локально)"""
+    prefix = f"{MINIO_BUCKET}/"
+    if minio_client and file_path.startswith(prefix):
+        try:
+            minio_client.remove_object(MINIO_BUCKET, file_path[len(prefix):])
+        except S3Error as e:
+            print(f"Ошибка удаления из MinIO: {e}")
+        return
+    Path(file_path).unlink(missing_ok=True)
+
+
+def _put_content(fileobj, company_id: int, file_hash: str, ext: str, content_type: str) -> str:
+    """Сохранение содержимого под ключом хэша; возвращает путь"""
+    object_name = f"{company_id}/{file_hash}{ext}"
+    if minio_client:
+        try:
+            put_to_minio(fileobj, object_name, content_type)
+            return f"{MINIO_BUCKET}/{object_name}"
+        except S3Error as e:
+            print(f"Ошибка загрузки в MinIO: {e}")
+            # Fallback к локальному хранению
+            fileobj.seek(0)
+    file_path_local = UPLOAD_DIR / f"{company_id}_{file_hash}{ext}"
+    write_local(fileobj, file_path_local)
+    return str(file_path_local)
+
+
+def object_lock(company_id: int, file_hash: str):
+    """Транзакционная блокировка содержимого компании (pg_advisory_xact_lock).
+
+    Объект пишется под ключом {company_id}/{hash}: загрузка и удаление файла
+    одного содержимого под этой блокировкой не выполняются одновременно.
+    """
+    return select(func.pg_advisory_xact_lock(company_id, func.hashtext(file_hash)))
+
+
+def object_exists(company_id: int, file_hash: str, path: str):
+    """Есть ли объект с этим файлом (например, созданный заново повторной загрузкой)"""
+    return select(exists().where(
+        StoredObject.company_id == company_id,
+        StoredObject.hash == file_hash,
+        StoredObject.path == path,
+    ))
+
+
+async def remove_unreferenced_file(db: AsyncSession, company_id: int, file_hash: str, path: str) -> bool:
+    """Удаление файла объекта, строка которого удалена (вызывается после commit).
+
+    Под блокировкой содержимого проверяется, что параллельная загрузка не
+    создала объект заново: она пишет файл по тому же пути.
+    """
+    await db.execute(object_lock(company_id, file_hash))
+    try:
+        if (await db.execute(object_exists(company_id, file_hash, path))).scalar():
+            return False
+        await run_in_threadpool(remove_file, path)
+        return True
+    finally:
+        # Снятие блокировки
+        await db.commit()
+
+
+async def store_content(
+    db: AsyncSession,
+    company_id: int,
+    fileobj,
+    file_hash: str,
+    file_size: int,
+    ext: str,
+    content_type: str,
+    filename: Optional[str] = None,
+) -> Tuple[StoredObject, bool]:
+    """Контентно-адресуемое сохранение файла в пределах компании.
+
+    Если объект с таким SHA-256 уже есть, байты повторно не передаются.
+    Возвращает (объект, был_ли_дубликат).
+    """
+    # Блокировка ключа до commit: файл удаляемого объекта с тем же содержимым
+    # не будет удалён после того, как эта загрузка запишет его заново
+    await db.execute(object_lock(company_id, file_hash))
+    # Блокировка строки до commit: очистка объектов без ссылок не удалит
+    # найденный объект, пока загрузка не добавила ссылку
+    result = await db.execute(
+        select(StoredObject)
+        .where(
+            StoredObject.company_id == company_id,
+            StoredObject.hash == file_hash,
+        )
+        .with_for_update()
+    )
+    stored = result.scalar_one_or_none()
+    if stored:
+        if stored.ref_count <= 0:
+            # Повторная загрузка продлевает срок хранения объекта без ссылок
+            stored.created_at = datetime.now(timezone.utc)
+        return stored, True
+
+    path = await run_in_threadpool(_put_content, fileobj, company_id, file_hash, ext, content_type)
+    # Параллельная загрузка того же содержимого пишет в тот же ключ,
+    # поэтому конфликт строки безопасно игнорируется
+    await db.execute(
+        insert(StoredObject)
+        .values(
+            company_id=company_id,
+            hash=file_hash,
+            path=path,
+            size=file_size,
+            content_type=content_type,
+            original_filename=filename,
+            ref_count=0,
+        )
+        .on_conflict_do_nothing(index_elements=["company_id", "hash"])
+    )
+    result = await db.execute(
+        select(StoredObject).where(
+            StoredObject.company_id == company_id,
+            StoredObject.hash == file_hash,
+        )
+    )
+    return result.scalar_one(), False
+
+
+async def add_reference(db: AsyncSession, company_id: int, file_hash: str) -> None:
+    """Увеличение счётчика ссылок на объект"""
+    await db.execute(
+        update(StoredObject)
+        .where(StoredObject.company_id == company_id, StoredObject.hash == file_hash)
+        .values(ref_count=StoredObject.ref_count + 1)
+    )
+
+
+async def release_reference(db: AsyncSession, company_id: int, file_hash: str, count: int = 1) -> Optional[str]:
+    """Уменьшение счётчика ссылок на count.
+
+    Если ссылок не осталось, строка удаляется и возвращается путь файла,
+    который нужно удалить после commit через remove_unreferenced_file.
+    """
+    result = await db.execute(
+        update(StoredObject)
+        .where(StoredObject.company_id == company_id, StoredObject.hash == file_hash)
+        .values(ref_count=StoredObject.ref_count - count)
+        .returning(StoredObject.id, StoredObject.ref_count, StoredObject.path)
+    )
+    row = result.first()
+    if row is None or row.ref_count > 0:
+        return None
+    await db.execute(StoredObject.__table__.delete().where(StoredObject.id == row.id))
+    return row.path
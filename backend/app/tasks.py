@@ -0,0 +1,191 @@
+import os
+import shlex
+import subprocess
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional
+
+from PyPDF2 import PdfReader
+from dotenv import load_dotenv
+from sqlalchemy import delete, exists
+
+from app.database import SessionLocal
+from app.models import Document, DocumentVersion, StoredObject, ProcessingJob, JobStatus
+from app.storage import hash_stored_file, local_copy, object_exists, object_lock, remove_file
+from app.search import SEARCH_CONFIG, rebuild_document_search, refresh_file_documents_search
+from app.stats import rebuild_document_stats
+from app.worker import celery_app
+
+load_dotenv()
+
+# Команда антивирусной проверки, {path} заменяется на путь к файлу,
+# например "clamdscan --no-summary {path}". Не задана - проверка пропускается
+VIRUS_SCAN_COMMAND = os.getenv("VIRUS_SCAN_COMMAND")
+# Ограничение объёма извлекаемого из PDF текста
+MAX_EXTRACTED_TEXT = int(os.getenv("MAX_EXTRACTED_TEXT", str(1024 * 1024)))
+# Срок хранения загруженных без документа объектов (ref_count=0), часы
+STORED_OBJECT_ORPHAN_TTL_HOURS = int(os.getenv("STORED_OBJECT_ORPHAN_TTL_HOURS", "24"))
+
+# Генераторы превью: (объект, локальный путь) -> путь превью или None
+PREVIEW_GENERATORS: List[Callable[[StoredObject, str], Optional[str]]] = []
+
+
+def register_preview_generator(func: Callable[[StoredObject, str], Optional[str]]):
+    """Регистрация генератора превью (например, рендер первой страницы PDF)"""
+    PREVIEW_GENERATORS.append(func)
+    return func
+
+
+def scan_for_viruses(path: str) -> str:
+    """Антивирусная проверка внешней командой: clean / infected / skipped"""
+    if not VIRUS_SCAN_COMMAND:
+        return "skipped"
+    command = [part.replace("{path}", path) for part in shlex.split(VIRUS_SCAN_COMMAND)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode == 0:
+        return "clean"
+    if completed.returncode == 1:
+        return "infected"
+    raise RuntimeError(f"Ошибка антивирусной проверки: {completed.stderr.strip()}")
+
+
+def extract_pdf(path: str):
+    """Количество страниц и текст PDF"""
+    reader = PdfReader(path)
+    parts = []
+    size = 0
+    for page in reader.pages:
+        if size >= MAX_EXTRACTED_TEXT:
+            break
+        text = page.extract_text() or ""
+        parts.append(text)
+        size += len(text)
+    return len(reader.pages), "\n".join(parts)[:MAX_EXTRACTED_TEXT]
+
+
+def _is_pdf(stored: StoredObject) -> bool:
+    return stored.content_type == "application/pdf" or stored.path.lower().endswith(".pdf")
+
+
+@celery_app.task(name="app.tasks.process_stored_object")
+def process_stored_object(job_id: str) -> dict:
+    """Обработка загруженного файла: целостность, антивирус, PDF, превью"""
+    db = SessionLocal()
+    try:
+        job = db.get(ProcessingJob, job_id)
+        if job is None:
+            return {"error": "job not found"}
+        stored = db.get(StoredObject, job.stored_object_id)
+        job.status = JobStatus.RUNNING
+        db.commit()
+
+        try:
+            result = {}
+            # Содержимое уже обработано (дубликат) - повторная работа не нужна
+            if stored.processed_at is None:
+                digest = hash_stored_file(stored.path)
+                if digest != stored.hash:
+                    raise ValueError("Хэш сохранённого файла не совпадает с загруженным")
+
+                with local_copy(stored.path) as path:
+                    stored.scan_status = scan_for_viruses(path)
+                    if stored.scan_status != "infected":
+                        if _is_pdf(stored):
+                            stored.page_count, stored.extracted_text = extract_pdf(path)
+                        for generator in PREVIEW_GENERATORS:
+                            preview_path = generator(stored, path)
+                            if preview_path:
+                                stored.preview_path = preview_path
+                                break
+                stored.processed_at = datetime.now(timezone.utc)
+                if stored.extracted_text:
+                    db.flush()
+                    refresh_file_documents_search(db, stored.company_id, stored.path)
+
+            result = {
+                "hash": stored.hash,
+                "scan_status": stored.scan_status,
+                "page_count": stored.page_count,
+                "preview_path": stored.preview_path,
+            }
+            if stored.scan_status == "infected":
+                job.status = JobStatus.FAILED
+                job.error = "Файл не прошёл антивирусную проверку"
+            else:
+                job.status = JobStatus.COMPLETED
+            job.result = result
+            db.commit()
+            return result
+        except Exception as e:
+            db.rollback()
+            job = db.get(ProcessingJob, job_id)
+            job.status = JobStatus.FAILED
+            job.error = str(e)
+            db.commit()
+            raise
+    finally:
+        db.close()
+
+
+@celery_app.task(name="app.tasks.reconcile_document_stats")
+def reconcile_document_stats(company_id: Optional[int] = None) -> dict:
+    """Пересборка счётчиков реестра с нуля (одной компании или всех)"""
+    db = SessionLocal()
+    try:
+        rebuild_document_stats(db, company_id)
+        db.commit()
+        return {"company_id": company_id}
+    finally:
+        db.close()
+
+
+@celery_app.task(name="app.tasks.rebuild_document_search")
+def rebuild_document_search_task() -> dict:
+    """Пересчёт поисковых векторов всех документов (после смены SEARCH_CONFIG)"""
+    db = SessionLocal()
+    try:
+        rebuild_document_search(db)
+        db.commit()
+        return {"config": SEARCH_CONFIG}
+    finally:
+        db.close()
+
+
+@celery_app.task(name="app.tasks.cleanup_orphaned_objects")
+def cleanup_orphaned_objects(ttl_hours: int = STORED_OBJECT_ORPHAN_TTL_HOURS) -> dict:
+    """Удаление объектов хранилища без ссылок старше ttl_hours.
+
+    Такие объекты остаются после загрузки файла без документа. Объект, на
+    который указывает документ или версия (ссылка не учтена в ref_count),
+    не удаляется. Задачи обработки удаляются каскадом.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=ttl_hours)
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            delete(StoredObject)
+            .where(
+                StoredObject.ref_count <= 0,
+                StoredObject.created_at < cutoff,
+                ~exists().where(
+                    Document.sender_company_id == StoredObject.company_id,
+                    Document.original_file_path == StoredObject.path,
+                ),
+                ~exists().where(DocumentVersion.file_path == StoredObject.path),
+            )
+            .returning(StoredObject.company_id, StoredObject.hash, StoredObject.path)
+        )
+        removed = result.all()
+        db.commit()
+
+        # Файлы удаляются после commit под блокировкой содержимого: если
+        # параллельная загрузка создала объект заново, файл принадлежит ей
+        paths = []
+        for company_id, file_hash, path in removed:
+            db.execute(object_lock(company_id, file_hash))
+            if not db.execute(object_exists(company_id, file_hash, path)).scalar():
+                remove_file(path)
+                paths.append(path)
+            db.commit()
+    finally:
+        db.close()
+    return {"removed": len(paths)}
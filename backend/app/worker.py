@@ -0,0 +1,36 @@
+from celery import Celery
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", REDIS_URL)
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", REDIS_URL)
+# Eager-режим: задачи выполняются синхронно в процессе (для тестов и отладки)
+CELERY_TASK_ALWAYS_EAGER = os.getenv("CELERY_TASK_ALWAYS_EAGER", "false").lower() == "true"
+# Периодичность очистки объектов хранилища без ссылок (celery beat), минуты
+ORPHAN_CLEANUP_INTERVAL_MINUTES = int(os.getenv("ORPHAN_CLEANUP_INTERVAL_MINUTES", "60"))
+
+celery_app = Celery(
+    "edo",
+    broker=CELERY_BROKER_URL,
+    backend=CELERY_RESULT_BACKEND,
+    include=["app.tasks"],
+)
+
+celery_app.conf.update(
+    task_always_eager=CELERY_TASK_ALWAYS_EAGER,
+    task_eager_propagates=False,
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    beat_schedule={
+        "cleanup-orphaned-objects": {
+            "task": "app.tasks.cleanup_orphaned_objects",
+            "schedule": ORPHAN_CLEANUP_INTERVAL_MINUTES * 60,
+        },
+    },
+)
@@ -0,0 +1,79 @@
+import asyncio
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max в миллисекундах"""
+    if not latencies:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(latencies)
+
+    def at(share: float) -> float:
+        return ordered[min(len(ordered) - 1, int(share * len(ordered)))] * 1000
+
+    return {"p50": at(0.50), "p95": at(0.95), "p99": at(0.99), "max": ordered[-1] * 1000}
+
+
+def format_stats(label: str, latencies: List[float], elapsed: float) -> str:
+    stats = percentiles(latencies)
+    rps = len(latencies) / elapsed if elapsed else 0.0
+    return (
+        f"{label:<24} n={len(latencies):<6} rps={rps:8.1f}  "
+        f"p50={stats['p50']:8.1f}  p95={stats['p95']:8.1f}  "
+        f"p99={stats['p99']:8.1f}  max={stats['max']:8.1f} мс"
+    )
+
+
+async def run_load(
+    request: Callable[[], Awaitable[httpx.Response]],
+    concurrency: int,
+    total: int,
+) -> List[float]:
+    """total запросов от concurrency одновременных клиентов; латентности успешных ответов"""
+    latencies: List[float] = []
+    remaining = total
+
+    async def client():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await request()
+            if response.status_code < 400:
+                latencies.append(time.perf_counter() - started)
+            else:
+                print(f"Ответ {response.status_code}: {response.text[:200]}")
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies
+
+
+@contextmanager
+def serve(app_path: str, port: int, *args: str, ready_path: str = "/docs", timeout: float = 30.0):
+    """uvicorn с одним воркером в отдельном процессе; ждёт, пока сервер начнёт отвечать"""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app_path, "--port", str(port), "--log-level", "warning", *args],
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn {app_path} завершился с кодом {process.returncode}")
+            try:
+                httpx.get(base_url + ready_path)
+                break
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait()
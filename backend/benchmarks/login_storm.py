@@ -0,0 +1,113 @@
+"""Шторм логинов: пропускная способность POST /api/auth/login и отзывчивость остальных эндпоинтов.
+
+Приложение запускается uvicorn с одним воркером. Сначала замеряется
+латентность пробных запросов (/health, /health/pool) без нагрузки,
+затем те же пробы повторяются, пока --concurrency клиентов непрерывно
+логинятся. bcrypt выполняется в пуле PASSWORD_HASH_WORKERS, поэтому
+латентность проб во время шторма должна оставаться того же порядка;
+ответы 503 - отказ по PASSWORD_HASH_QUEUE_LIMIT.
+
+Запуск из backend/ (пользователь уже существует в БД):
+    python -m benchmarks.login_storm --email admin@example.com --password secret
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+import httpx
+
+from benchmarks.load import format_stats, serve
+
+
+async def probe(client: httpx.AsyncClient, url: str, interval: float, stop: asyncio.Event) -> List[float]:
+    """Пробные запросы с фиксированным интервалом до stop"""
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get(url)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def storm(client: httpx.AsyncClient, url: str, form: dict, concurrency: int, stop: asyncio.Event) -> dict:
+    """Непрерывные логины от concurrency клиентов до stop"""
+    counts = {"ok": 0, "rejected": 0}
+
+    async def login():
+        while not stop.is_set():
+            response = await client.post(url, data=form)
+            if response.status_code == 200:
+                counts["ok"] += 1
+            elif response.status_code == 503:
+                counts["rejected"] += 1
+            else:
+                raise RuntimeError(f"Логин: {response.status_code} {response.text[:200]}")
+
+    await asyncio.gather(*(login() for _ in range(concurrency)))
+    return counts
+
+
+async def run_probes(client, base_url: str, args, during_storm: bool) -> List[str]:
+    stop = asyncio.Event()
+    targets = ["/health", "/health/pool"]
+    tasks = [
+        asyncio.create_task(probe(client, f"{base_url}{path}", args.probe_interval, stop))
+        for path in targets
+    ]
+    storm_task = None
+    if during_storm:
+        form = {"username": args.email, "password": args.password}
+        storm_task = asyncio.create_task(
+            storm(client, f"{base_url}/api/auth/login", form, args.concurrency, stop)
+        )
+    started = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    stop.set()
+    results = await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    phase = "шторм" if during_storm else "фон"
+    lines = [format_stats(f"{phase} GET {path}", latencies, elapsed) for path, latencies in zip(targets, results)]
+    if storm_task is not None:
+        counts = await storm_task
+        lines.append(
+            f"{phase} POST /api/auth/login   успешно={counts['ok']} ({counts['ok'] / elapsed:.1f}/с), "
+            f"503={counts['rejected']}"
+        )
+    return lines
+
+
+async def measure(base_url: str, args) -> List[str]:
+    limits = httpx.Limits(max_connections=args.concurrency + 10)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        # Проверка учётных данных до шторма
+        response = await client.post(
+            f"{base_url}/api/auth/login", data={"username": args.email, "password": args.password}
+        )
+        response.raise_for_status()
+        return (
+            await run_probes(client, base_url, args, during_storm=False)
+            + await run_probes(client, base_url, args, during_storm=True)
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=50, help="одновременных логинов")
+    parser.add_argument("--duration", type=float, default=10, help="длительность фазы, с")
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8102)
+    args = parser.parse_args()
+
+    with serve("app.main:app", args.port, ready_path="/health") as base_url:
+        for line in asyncio.run(measure(base_url, args)):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Поиск контрагентов на 500k записей одной компании: с индексами pg_trgm и без них.
+
+Запросы строятся той же функцией, что и GET /api/partners/?search=
+(app.routers.partners.apply_partner_search). Режим "без индексов" выключает
+index/bitmap scan, что соответствует плану до добавления GIN-индексов
+(последовательное чтение контрагентов компании).
+
+Запуск из backend/ (при первом запуске заполняет компанию-бенчмарк):
+    python -m benchmarks.partner_search --partners 500000
+"""
+import argparse
+import time
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from app.database import engine
+from app.models import Company, Partner
+from app.routers.partners import apply_partner_search
+from benchmarks.load import percentiles
+
+BENCH_INN = "000000000500"
+
+# Ввод в окне выбора контрагента: фрагменты наименования и префиксы ИНН
+SEARCHES = ["ромаш", "Ромашка Плюс", "торг", "ООО Вект", "7701", "770123", "0123"]
+
+SEED_SQL = text("""
+    INSERT INTO partners (company_id, partner_name, partner_inn, is_connected, created_at)
+    SELECT
+        :company_id,
+        (ARRAY['ООО', 'ОсОО', 'ИП', 'АО'])[1 + g % 4] || ' ' ||
+        (ARRAY['Ромашка', 'Вектор', 'Альфа', 'Торговый дом', 'Стройсервис', 'Агро',
+               'Логистик', 'Меридиан', 'Восток', 'Импульс'])[1 + (g * 7) % 10] || ' ' ||
+        (ARRAY['Плюс', 'Трейд', 'Групп', 'Азия', 'Инвест', 'Сервис', 'Центр'])[1 + (g * 13) % 7] ||
+        ' ' || g,
+        -- 999999999989 простое: ИНН уникальны в пределах компании
+        lpad(((g::bigint * 387420489) % 999999999989)::text, 12, '0'),
+        g % 3 = 0,
+        now() - g * interval '1 minute'
+    FROM generate_series(:start, :stop) AS g
+""")
+
+
+def seed(session: Session, partners: int) -> int:
+    company = session.execute(select(Company).where(Company.inn == BENCH_INN)).scalar_one_or_none()
+    if company is None:
+        company = Company(name="Бенчмарк поиска контрагентов", inn=BENCH_INN)
+        session.add(company)
+        session.flush()
+    existing = session.execute(
+        select(func.count()).select_from(Partner).where(Partner.company_id == company.id)
+    ).scalar()
+    if existing < partners:
+        print(f"Заполнение: {existing} -> {partners} контрагентов")
+        for start in range(existing + 1, partners + 1, 100_000):
+            session.execute(
+                SEED_SQL,
+                {"company_id": company.id, "start": start, "stop": min(start + 99_999, partners)},
+            )
+        session.commit()
+        session.execute(text("ANALYZE partners"))
+    return company.id
+
+
+def measure(session: Session, company_id: int, search: str, repeat: int, limit: int) -> dict:
+    query = apply_partner_search(select(Partner).where(Partner.company_id == company_id), search)
+    query = query.limit(limit)
+    latencies = []
+    found = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        found = len(session.execute(query).scalars().all())
+        latencies.append(time.perf_counter() - started)
+        session.expunge_all()
+    return {"found": found, **percentiles(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--partners", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    with Session(engine) as session:
+        company_id = seed(session, args.partners)
+        for mode in ("с индексами", "без индексов"):
+            session.rollback()
+            if mode == "без индексов":
+                session.execute(text("SET LOCAL enable_indexscan = off"))
+                session.execute(text("SET LOCAL enable_bitmapscan = off"))
+            print(mode)
+            for search in SEARCHES:
+                stats = measure(session, company_id, search, args.repeat, args.limit)
+                print(
+                    f"  {search!r:<16} найдено={stats['found']:<3} "
+                    f"p50={stats['p50']:8.1f}  p99={stats['p99']:8.1f} мс"
+                )
+
+
+if __name__ == "__main__":
+    main()
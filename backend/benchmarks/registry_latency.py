@@ -0,0 +1,99 @@
+"""Латентность реестра документов при 200 одновременных клиентах: до и после перевода роутеров на AsyncSession.
+
+before - async-обработчик с синхронной Session (как было до переноса): каждый
+запрос к БД блокирует event loop воркера. Сессия закрывается в самом
+обработчике: с Depends(get_db) закрытие выполняется после ответа, и при
+конкурентности выше пула (DB_POOL_SIZE + DB_MAX_OVERFLOW) event loop
+блокируется в ожидании соединения до DB_POOL_TIMEOUT. after - тот же запрос через
+AsyncSession/asyncpg. --db-delay-ms добавляет pg_sleep перед запросом,
+имитируя задержку сети до БД или медленный запрос. Оба приложения запускаются uvicorn с одним воркером
+на одной и той же БД, данные уже должны быть в ней.
+
+Запуск из backend/:
+    python -m benchmarks.registry_latency --company-id 1
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import Depends, FastAPI, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import SessionLocal, get_async_db
+from app.models import Document
+from app.serialization import document_list, list_response
+from benchmarks.load import format_stats, run_load, serve
+
+before_app = FastAPI()
+after_app = FastAPI()
+
+
+@before_app.get("/documents")
+async def registry_before(
+    company_id: int,
+    limit: int = Query(20, le=100),
+    delay: float = 0,
+):
+    with SessionLocal() as db:
+        if delay:
+            db.execute(select(func.pg_sleep(delay)))
+        documents = (
+            db.query(Document)
+            .filter(Document.sender_company_id == company_id)
+            .order_by(Document.created_at.desc(), Document.id.desc())
+            .limit(limit)
+            .all()
+        )
+        return list_response(document_list, documents)
+
+
+@after_app.get("/documents")
+async def registry_after(
+    company_id: int,
+    limit: int = Query(20, le=100),
+    delay: float = 0,
+    db: AsyncSession = Depends(get_async_db),
+):
+    if delay:
+        await db.execute(select(func.pg_sleep(delay)))
+    result = await db.execute(
+        select(Document)
+        .where(Document.sender_company_id == company_id)
+        .order_by(Document.created_at.desc(), Document.id.desc())
+        .limit(limit)
+    )
+    return list_response(document_list, result.scalars().all())
+
+
+async def measure(base_url: str, args) -> str:
+    url = f"{base_url}/documents"
+    params = {"company_id": args.company_id, "limit": args.limit, "delay": args.db_delay_ms / 1000}
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        # Прогрев пула соединений
+        await run_load(lambda: client.get(url, params=params), args.concurrency, args.concurrency)
+        started = time.perf_counter()
+        latencies = await run_load(lambda: client.get(url, params=params), args.concurrency, args.requests)
+        return format_stats("GET /documents", latencies, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--company-id", type=int, required=True)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--db-delay-ms", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--port", type=int, default=8101)
+    args = parser.parse_args()
+
+    for name in ("before_app", "after_app"):
+        with serve(f"benchmarks.registry_latency:{name}", args.port) as base_url:
+            line = asyncio.run(measure(base_url, args))
+        print(f"{name.removesuffix('_app'):<7} {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Сериализация страниц реестра документов и контрагентов и размер ответа на проводе.
+
+Сравниваются путь FastAPI по умолчанию (модели pydantic -> jsonable_encoder ->
+json.dumps, как JSONResponse) и адаптеры TypeAdapter + orjson из
+app/serialization.py, затем размер тела без сжатия, с gzip и brotli
+(app/compression.py, уровни GZIP_LEVEL/BROTLI_QUALITY). БД не нужна:
+страница собирается из ORM-объектов в памяти.
+
+Запуск из backend/:
+    python -m benchmarks.serialization --rows 100
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+
+from app.compression import brotli, compress
+from app.models import Document, DocumentStatus, DocumentType, Partner
+from app.schemas import DocumentResponse, PartnerResponse
+from app.serialization import document_list, dump_list, partner_list
+from benchmarks.load import percentiles
+
+
+def documents_page(rows: int) -> list:
+    started = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        Document(
+            id=index,
+            number=f"АКТ-2026/{index:05d}",
+            document_type=DocumentType.ACT,
+            status=DocumentStatus.SENT,
+            sender_company_id=1,
+            receiver_company_id=2 + index % 50,
+            date=started + timedelta(days=index),
+            amount=Decimal("125000.50") + index,
+            currency="сом",
+            nds=Decimal("15000.06"),
+            original_file_path=f"1/{index:064x}.pdf",
+            version=1,
+            created_at=started + timedelta(minutes=index),
+        )
+        for index in range(rows)
+    ]
+
+
+def partners_page(rows: int) -> list:
+    started = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    return [
+        Partner(
+            id=index,
+            company_id=1,
+            partner_name=f"ООО Торговый дом Ромашка {index}",
+            partner_inn=f"{7701000000 + index:012d}",
+            partner_email=f"partner{index}@example.com",
+            partner_phone="+996 555 000 000",
+            is_connected=index % 3 == 0,
+            created_at=started + timedelta(minutes=index),
+        )
+        for index in range(rows)
+    ]
+
+
+def default_path(schema, items: list) -> bytes:
+    # Как FastAPI без response_class: валидация, jsonable_encoder, JSONResponse.render
+    models = [schema.model_validate(item) for item in items]
+    return json.dumps(
+        jsonable_encoder(models), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def timed(func, repeat: int):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        latencies.append(time.perf_counter() - started)
+    return result, percentiles(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    pages = {
+        "documents": (DocumentResponse, document_list, documents_page(args.rows)),
+        "partners": (PartnerResponse, partner_list, partners_page(args.rows)),
+    }
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    for name, (schema, adapter, items) in pages.items():
+        default_body, default_stats = timed(lambda: default_path(schema, items), args.repeat)
+        body, adapter_stats = timed(lambda: dump_list(adapter, items), args.repeat)
+        print(f"{name}, {args.rows} строк")
+        print(f"  jsonable_encoder+json  p50={default_stats['p50']:7.2f}  p99={default_stats['p99']:7.2f} мс  {len(default_body):>8} байт")
+        print(f"  TypeAdapter+orjson     p50={adapter_stats['p50']:7.2f}  p99={adapter_stats['p99']:7.2f} мс  {len(body):>8} байт")
+        for encoding in encodings:
+            compressed, stats = timed(lambda: compress(body, encoding), args.repeat)
+            print(
+                f"  {encoding:<22} p50={stats['p50']:7.2f}  p99={stats['p99']:7.2f} мс  "
+                f"{len(compressed):>8} байт ({len(compressed) / len(body):.0%})"
+            )
+
+
+if __name__ == "__main__":
+    main()
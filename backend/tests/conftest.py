@@ -0,0 +1,133 @@
+import os
+from pathlib import Path
+
+import pytest
+
+# Тесты с БД запускаются только на отдельной базе: TEST_DATABASE_URL.
+# URL подставляется до импорта app.database, который читает DATABASE_URL
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture(scope="session")
+def migrated_engine():
+    """Движок app.database со схемой, созданной миграциями (alembic upgrade head)"""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL не задан")
+
+    from alembic import command
+    from alembic.config import Config
+
+    from app.database import engine
+
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    command.upgrade(config, "head")
+    return engine
+
+
+@pytest.fixture
+def db_session(migrated_engine):
+    """Сессия в транзакции, которая откатывается после теста"""
+    from sqlalchemy.orm import Session
+
+    connection = migrated_engine.connect()
+    transaction = connection.begin()
+    session = Session(bind=connection, autoflush=False)
+    try:
+        yield session
+    finally:
+        session.close()
+        transaction.rollback()
+        connection.close()
+
+
+@pytest.fixture
+def make_company(migrated_engine):
+    """Фабрика компаний с пользователем-администратором.
+
+    Данные фиксируются: API и задачи читают их через свои соединения. После теста
+    удаляется всё, что ссылается на созданные компании.
+    """
+    from sqlalchemy import delete, or_, select
+    from sqlalchemy.orm import Session
+
+    from app.models import (
+        Comment,
+        Company,
+        Document,
+        DocumentStat,
+        DocumentVersion,
+        Partner,
+        ProcessingJob,
+        Signature,
+        StoredObject,
+        User,
+        UserRole,
+    )
+
+    company_ids = []
+
+    def make(name: str, inn: str, full_name: str = "Тестовый пользователь"):
+        with Session(migrated_engine) as session:
+            company = Company(name=name, inn=inn)
+            session.add(company)
+            session.flush()
+            user = User(
+                email=f"{inn}@example.com",
+                hashed_password="-",
+                full_name=full_name,
+                role=UserRole.ADMIN,
+                company_id=company.id,
+            )
+            session.add(user)
+            session.commit()
+            company_ids.append(company.id)
+            # Пользователь для get_current_active_user, не привязанный к сессии
+            return User(id=user.id, company_id=company.id, is_active=True, full_name=full_name)
+
+    yield make
+
+    if not company_ids:
+        return
+    with Session(migrated_engine) as session:
+        documents = select(Document.id).where(
+            or_(Document.sender_company_id.in_(company_ids), Document.receiver_company_id.in_(company_ids))
+        )
+        for model in (Comment, DocumentVersion, Signature):
+            session.execute(delete(model).where(model.document_id.in_(documents)))
+        session.execute(delete(ProcessingJob).where(ProcessingJob.company_id.in_(company_ids)))
+        session.execute(delete(Document).where(Document.id.in_(documents)))
+        for model in (DocumentStat, StoredObject, Partner, User):
+            session.execute(delete(model).where(model.company_id.in_(company_ids)))
+        session.execute(delete(Company).where(Company.id.in_(company_ids)))
+        session.commit()
+
+
+@pytest.fixture
+def current_user(make_company):
+    """Пользователь, от имени которого работает client; модули тестов переопределяют его"""
+    return make_company("ООО Тестовая", "7700000001")
+
+
+@pytest.fixture
+def client(current_user):
+    """Клиент API от имени current_user"""
+    from fastapi.testclient import TestClient
+
+    from app.auth import get_current_active_user
+    from app.database import async_engine
+    from app.main import app
+
+    app.dependency_overrides[get_current_active_user] = lambda: current_user
+    try:
+        with TestClient(app) as client:
+            yield client
+            # Соединения asyncpg привязаны к event loop клиента: закрываем их в нём же
+            client.portal.call(async_engine.dispose)
+    finally:
+        app.dependency_overrides.pop(get_current_active_user, None)
@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from sqlalchemy import delete, select
+
+from app.models import Certificate
+from app.signing import (
+    CertificateCache,
+    SigningSessionStore,
+    certificate_issuer,
+    certificate_pem,
+    certificate_serial,
+)
+
+SERIAL = 0x1234
+
+
+def _certificate(issuer_name: str) -> x509.Certificate:
+    """Самоподписанный сертификат с общим серийным номером SERIAL"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, issuer_name)])
+    now = datetime.now(timezone.utc)
+    return (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(SERIAL)
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+
+
+@pytest.fixture
+def certificates():
+    return _certificate("УЦ Первый"), _certificate("УЦ Второй")
+
+
+def test_cache_separates_issuers_with_same_serial(certificates):
+    cache = CertificateCache(ttl=60, maxsize=10)
+    first, second = certificates
+
+    infos = [
+        cache.get(certificate_issuer(cert), certificate_serial(cert), certificate_pem(cert))
+        for cert in (first, second)
+    ]
+
+    assert infos[0].public_key.public_numbers() == first.public_key().public_numbers()
+    assert infos[1].public_key.public_numbers() == second.public_key().public_numbers()
+
+
+def test_signing_sessions_capped_per_user():
+    store = SigningSessionStore(ttl=60, maxsize=4, max_per_user=2)
+    other = store.open(2, None, None)[0]
+    sessions = [store.open(1, None, None)[0] for _ in range(5)]
+
+    # Пользователь 1 вытесняет только свои старые сессии
+    assert store.get(other, 2) is not None
+    assert [store.get(session_id, 1) is not None for session_id in sessions] == [False, False, False, True, True]
+
+
+@pytest.fixture
+def certificate_rows(migrated_engine, certificates):
+    """Удаляет сохранённые тестом сертификаты с серийным номером SERIAL"""
+    from sqlalchemy.orm import Session
+
+    yield
+    with Session(migrated_engine) as session:
+        session.execute(delete(Certificate).where(Certificate.serial == certificate_serial(certificates[0])))
+        session.commit()
+
+
+def test_store_keeps_certificates_of_different_issuers(migrated_engine, certificates, certificate_rows):
+    from sqlalchemy.orm import Session
+
+    from app.database import AsyncSessionLocal, async_engine
+    from app.routers.signature import _store_certificate
+
+    async def scenario():
+        try:
+            async with AsyncSessionLocal() as db:
+                for cert in certificates + certificates:
+                    await _store_certificate(db, cert)
+                await db.commit()
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(scenario())
+    with Session(migrated_engine) as session:
+        stored = session.execute(
+            select(Certificate.issuer, Certificate.certificate_pem).where(
+                Certificate.serial == certificate_serial(certificates[0])
+            )
+        ).all()
+
+    assert sorted(stored) == sorted(
+        (certificate_issuer(cert), certificate_pem(cert)) for cert in certificates
+    )
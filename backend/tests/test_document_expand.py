@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event, insert, select
+
+from app.models import (
+    Comment,
+    Document,
+    DocumentStatus,
+    DocumentType,
+    DocumentVersion,
+    Signature,
+)
+
+DOCUMENTS = 60
+EXPAND = "signatures,versions,comments,sender_company,receiver_company"
+
+
+@pytest.fixture
+def current_user(make_company, migrated_engine):
+    """Пользователь отправителя с документами и их связями"""
+    from sqlalchemy.orm import Session
+
+    user = make_company("ООО Развёртка", "7700000101", full_name="Развёртка")
+    receiver = make_company("ООО Получатель развёртки", "7700000102")
+
+    with Session(migrated_engine) as session:
+        started = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        document_ids = session.execute(
+            insert(Document).returning(Document.id),
+            [
+                {
+                    "number": f"Р-{index}",
+                    "document_type": DocumentType.ACT,
+                    "status": DocumentStatus.DRAFT,
+                    "sender_company_id": user.company_id,
+                    "receiver_company_id": receiver.company_id,
+                    "created_at": started + timedelta(minutes=index),
+                }
+                for index in range(DOCUMENTS)
+            ],
+        ).scalars().all()
+        for model, rows in (
+            (Signature, [{"signer_id": user.id}] * 2),
+            (DocumentVersion, [{"version_number": 1, "file_path": "v", "created_by": user.id}]),
+            (Comment, [{"user_id": user.id, "text": "Комментарий"}] * 2),
+        ):
+            session.execute(
+                insert(model),
+                [{"document_id": document_id, **row} for document_id in document_ids for row in rows],
+            )
+        session.commit()
+    return user
+
+
+@pytest.fixture
+def query_counter():
+    """Число SQL-запросов к асинхронному движку (как before_cursor_execute в app.metrics)"""
+    from app.database import async_engine
+
+    counter = {"count": 0}
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counter["count"] += 1
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    yield counter
+    event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+
+
+def _count_queries(client, query_counter, **params) -> int:
+    query_counter["count"] = 0
+    response = client.get("/api/documents/", params=params)
+    assert response.status_code == 200
+    assert len(response.json()) == params["limit"]
+    return query_counter["count"]
+
+
+@pytest.mark.parametrize("direction", ["outgoing", "all"])
+def test_expand_query_count_does_not_depend_on_page_size(client, query_counter, direction):
+    params = {"expand": EXPAND, "direction": direction}
+    # Первый запрос прогревает соединение пула (служебные запросы драйвера)
+    _count_queries(client, query_counter, limit=1, **params)
+
+    counts = {limit: _count_queries(client, query_counter, limit=limit, **params) for limit in (1, 10, 50)}
+
+    assert len(set(counts.values())) == 1, f"число запросов зависит от размера страницы: {counts}"
+
+
+def test_expand_returns_loaded_relations(client):
+    response = client.get("/api/documents/", params={"expand": EXPAND, "limit": 5})
+
+    document = response.json()[0]
+    assert len(document["signatures"]) == 2
+    assert document["signatures"][0]["signer_name"] == "Развёртка"
+    assert len(document["versions"]) == 1
+    assert document["comments"][0]["user_name"] == "Развёртка"
+    assert document["receiver_company"]["name"] == "ООО Получатель развёртки"
+
+
+def test_etag_changes_when_comment_is_edited(client, migrated_engine):
+    from sqlalchemy.orm import Session
+
+    document_id = client.get("/api/documents/", params={"limit": 1}).json()[0]["id"]
+    url = f"/api/documents/{document_id}"
+    etag = client.get(url, params={"expand": "comments"}).headers["ETag"]
+
+    # Число комментариев то же, меняется только текст
+    with Session(migrated_engine) as session:
+        comment = session.execute(select(Comment).where(Comment.document_id == document_id).limit(1)).scalar_one()
+        comment.text = "Исправленный комментарий"
+        session.commit()
+
+    response = client.get(url, params={"expand": "comments"}, headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
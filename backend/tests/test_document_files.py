@@ -0,0 +1,231 @@
+import asyncio
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete, select
+
+from app.models import (
+    Document,
+    DocumentType,
+    DocumentVersion,
+    JobStatus,
+    ProcessingJob,
+    StoredObject,
+)
+
+
+def run(scenario):
+    """Сценарий в своём event loop; соединения asyncpg закрываются в нём же"""
+    from app.database import async_engine
+
+    async def wrapper():
+        try:
+            return await scenario()
+        finally:
+            await async_engine.dispose()
+
+    return asyncio.run(wrapper())
+
+
+def _document(company_id: int, path: str) -> Document:
+    return Document(
+        number="Ф-1",
+        document_type=DocumentType.ACT,
+        sender_company_id=company_id,
+        original_file_path=path,
+    )
+
+
+def test_release_skips_legacy_version_with_same_hash(current_user):
+    from app.database import AsyncSessionLocal
+    from app.routers.documents import _release_document_files
+
+    file_hash = "a" * 64
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            # Объект используется загруженной версией и ещё одним документом
+            stored = StoredObject(
+                company_id=current_user.company_id, hash=file_hash, path=f"bucket/{file_hash}.pdf", size=1, ref_count=2
+            )
+            document = _document(current_user.company_id, stored.path)
+            db.add_all([stored, document])
+            await db.flush()
+            db.add_all([
+                DocumentVersion(
+                    document_id=document.id, version_number=1, file_path="uploads/old.pdf",
+                    hash=file_hash, created_by=current_user.id,
+                ),
+                DocumentVersion(
+                    document_id=document.id, version_number=2, file_path=stored.path,
+                    hash=file_hash, created_by=current_user.id,
+                ),
+            ])
+            await db.flush()
+            orphaned = await _release_document_files(db, current_user.company_id, [document.id])
+            await db.refresh(stored)
+            return orphaned, stored.ref_count
+
+    orphaned, ref_count = run(scenario)
+
+    assert orphaned == []
+    assert ref_count == 1
+
+
+def test_backfilled_version_adds_reference(current_user, tmp_path):
+    from app.database import AsyncSessionLocal
+    from app.routers.signature import _document_digests
+
+    content = b"%PDF-1.4 legacy"
+    file_hash = hashlib.sha256(content).hexdigest()
+    path = tmp_path / f"{file_hash}.pdf"
+    path.write_bytes(content)
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            stored = StoredObject(
+                company_id=current_user.company_id, hash=file_hash, path=str(path), size=len(content), ref_count=0
+            )
+            document = _document(current_user.company_id, str(path))
+            db.add_all([stored, document])
+            await db.flush()
+            digests = await _document_digests(db, [document], current_user.id)
+            await db.flush()
+            await db.refresh(stored)
+            versions = (
+                await db.execute(select(DocumentVersion).where(DocumentVersion.document_id == document.id))
+            ).scalars().all()
+            result = digests[document.id], stored.ref_count, [version.hash for version in versions]
+            await db.commit()
+            return result
+
+    digest, ref_count, version_hashes = run(scenario)
+
+    assert digest == file_hash
+    assert version_hashes == [file_hash]
+    assert ref_count == 1
+
+
+def test_cleanup_removes_only_old_unreferenced_objects(current_user, migrated_engine, tmp_path):
+    from sqlalchemy.orm import Session
+
+    from app.tasks import cleanup_orphaned_objects
+
+    old = datetime.now(timezone.utc) - timedelta(hours=48)
+    files = {name: tmp_path / f"{name}.pdf" for name in ("orphan", "fresh", "attached")}
+    for path in files.values():
+        path.write_bytes(b"%PDF-1.4")
+
+    with Session(migrated_engine) as session:
+        session.add_all([
+            StoredObject(
+                company_id=current_user.company_id, hash=name[0] * 64, path=str(path), size=8, ref_count=0,
+                created_at=datetime.now(timezone.utc) if name == "fresh" else old,
+            )
+            for name, path in files.items()
+        ])
+        # Документ указывает на объект, хотя ссылка не учтена в ref_count
+        session.add(_document(current_user.company_id, str(files["attached"])))
+        session.commit()
+
+    result = cleanup_orphaned_objects(ttl_hours=24)
+
+    with Session(migrated_engine) as session:
+        remaining = session.execute(
+            select(StoredObject.path).where(StoredObject.company_id == current_user.company_id)
+        ).scalars().all()
+    assert result == {"removed": 1}
+    assert sorted(remaining) == sorted([str(files["fresh"]), str(files["attached"])])
+    assert not files["orphan"].exists()
+    assert files["fresh"].exists()
+
+
+def test_download_keeps_non_ascii_filename():
+    from app.routers.files import _content_disposition
+
+    assert _content_disposition("act.pdf") == 'attachment; filename="act.pdf"'
+    assert _content_disposition("Акт сверки.pdf") == (
+        "attachment; filename*=utf-8''%D0%90%D0%BA%D1%82%20%D1%81%D0%B2%D0%B5%D1%80%D0%BA%D0%B8.pdf"
+    )
+
+
+def test_upload_succeeds_when_queue_is_unavailable(client, migrated_engine, monkeypatch):
+    from pathlib import Path
+
+    from sqlalchemy.orm import Session
+
+    from app.routers import files
+
+    def broker_down(*args, **kwargs):
+        raise ConnectionError("брокер недоступен")
+
+    monkeypatch.setattr(files.process_stored_object, "apply_async", broker_down)
+    response = client.post(
+        "/api/files/upload", files={"file": ("Акт.pdf", b"%PDF-1.4 queue", "application/pdf")}
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    with Session(migrated_engine) as session:
+        job = session.get(ProcessingJob, body["job_id"])
+        status, error = job.status, job.error
+    if not body["path"].startswith(f"{files.MINIO_BUCKET}/"):
+        Path(body["path"]).unlink(missing_ok=True)
+
+    assert status == JobStatus.FAILED
+    assert "брокер недоступен" in error
+
+
+def test_infected_duplicate_not_attached_to_document(client, current_user, migrated_engine, tmp_path):
+    from sqlalchemy.orm import Session
+
+    content = b"%PDF-1.4 infected"
+    file_hash = hashlib.sha256(content).hexdigest()
+    with Session(migrated_engine) as session:
+        document = _document(current_user.company_id, None)
+        session.add_all([
+            document,
+            StoredObject(
+                company_id=current_user.company_id, hash=file_hash, path=str(tmp_path / "infected.pdf"), size=len(content),
+                ref_count=0, scan_status="infected", processed_at=datetime.now(timezone.utc),
+            ),
+        ])
+        session.commit()
+        document_id = document.id
+
+    upload = {"file": ("Акт.pdf", content, "application/pdf")}
+    attached = client.post("/api/files/upload", params={"document_id": document_id}, files=upload)
+    standalone = client.post("/api/files/upload", files=upload)
+
+    with Session(migrated_engine) as session:
+        versions = session.execute(
+            select(DocumentVersion).where(DocumentVersion.document_id == document_id)
+        ).scalars().all()
+    assert attached.status_code == 400
+    assert versions == []
+    assert standalone.json()["scan_status"] == "infected"
+    assert standalone.json()["job_id"] is None
+
+
+def test_file_of_recreated_object_is_not_removed(current_user, tmp_path):
+    from app.database import AsyncSessionLocal
+    from app.storage import remove_unreferenced_file
+
+    file_hash = "d" * 64
+    path = tmp_path / f"{file_hash}.pdf"
+    path.write_bytes(b"%PDF-1.4")
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            # Документ удалён, а повторная загрузка того же содержимого создала объект заново
+            db.add(StoredObject(company_id=current_user.company_id, hash=file_hash, path=str(path), size=8, ref_count=0))
+            await db.commit()
+            kept = await remove_unreferenced_file(db, current_user.company_id, file_hash, str(path))
+            await db.execute(delete(StoredObject).where(StoredObject.hash == file_hash))
+            await db.commit()
+            removed = await remove_unreferenced_file(db, current_user.company_id, file_hash, str(path))
+            return kept, removed
+
+    assert run(scenario) == (False, True)
+    assert not path.exists()
@@ -0,0 +1,61 @@
+import io
+
+import pytest
+from pydantic import ValidationError
+
+from app.partner_import import _detect_encoding, iter_csv_rows
+from app.schemas import PartnerCreate
+
+SAMPLE_SIZE = 64 * 1024
+
+
+def _cyrillic_csv(padding: str) -> bytes:
+    # Пробелы в начале первого наименования сдвигают границу и обрезаются при разборе
+    lines = ["name;inn", f"{padding}ООО Ромашка0;100000000000"]
+    index = 1
+    while len("\n".join(lines).encode("utf-8")) < 3 * SAMPLE_SIZE:
+        lines.append(f"ООО Ромашка{index};{100000000000 + index}")
+        index += 1
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _split_at_sample_boundary() -> bytes:
+    # Подбираем смещение так, чтобы граница образца резала двухбайтовый символ
+    for padding_size in range(64):
+        content = _cyrillic_csv(" " * padding_size)
+        try:
+            content[:SAMPLE_SIZE].decode("utf-8")
+        except UnicodeDecodeError:
+            return content
+    raise AssertionError("не удалось построить файл с разрезанным символом")
+
+
+def test_utf8_detected_when_sample_splits_character():
+    content = _split_at_sample_boundary()
+    assert _detect_encoding(io.BytesIO(content)) == "utf-8-sig"
+
+
+def test_multi_chunk_cyrillic_csv_keeps_names():
+    content = _split_at_sample_boundary()
+    rows = list(iter_csv_rows(io.BytesIO(content)))
+    names = [row["partner_name"] for _, row in rows]
+    assert names[0] == "ООО Ромашка0"
+    assert all(name.startswith("ООО Ромашка") for name in names)
+    assert len(content) > 2 * SAMPLE_SIZE
+
+
+def test_cp1251_export_detected():
+    content = "Наименование;ИНН\nООО Ромашка;123456789012\n".encode("cp1251")
+    rows = list(iter_csv_rows(io.BytesIO(content)))
+    assert rows == [(2, {"partner_name": "ООО Ромашка", "partner_inn": "123456789012"})]
+
+
+@pytest.mark.parametrize(
+    "field, value",
+    [("partner_name", "О" * 256), ("partner_inn", "1" * 21), ("partner_phone", "+" * 51)],
+)
+def test_overlong_row_fails_validation(field, value):
+    # Иначе строка доходит до БД и обрывает импорт с 500 вместо ошибки строки
+    row = {"partner_name": "ООО Ромашка", "partner_inn": "123456789012", field: value}
+    with pytest.raises(ValidationError):
+        PartnerCreate(**row)
@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from app import principal_cache as principal_cache_module
+from app.principal_cache import cached_principal, principal_key, store_principal
+from app.response_cache import MemoryResponseCache
+
+PRINCIPAL = {"id": 1, "email": "user@example.com", "is_active": True}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = MemoryResponseCache(ttl=60, maxsize=10)
+    monkeypatch.setattr(principal_cache_module, "principal_cache", cache)
+    return cache
+
+
+def test_principal_stored_after_miss(cache):
+    async def scenario():
+        principal, generation = await cached_principal(1)
+        assert principal is None
+        await store_principal(1, PRINCIPAL, generation)
+        return (await cached_principal(1))[0]
+
+    assert asyncio.run(scenario()) == PRINCIPAL
+
+
+def test_deactivated_principal_not_stored_after_invalidation(cache):
+    async def scenario():
+        _, generation = await cached_principal(1)
+        # Пока запрос читал пользователя, его деактивировали и сбросили ключ после commit
+        cache.delete_nowait([principal_key(1)])
+        await store_principal(1, PRINCIPAL, generation)
+        return (await cached_principal(1))[0]
+
+    assert asyncio.run(scenario()) is None
@@ -0,0 +1,178 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import insert, select, text
+from sqlalchemy.dialects import postgresql
+
+from app.models import (
+    Company,
+    Document,
+    DocumentStatus,
+    DocumentType,
+    DocumentVersion,
+    Partner,
+    Signature,
+    User,
+    UserRole,
+)
+
+DOCUMENTS = 2000
+
+
+@pytest.fixture
+def registry(db_session):
+    """Две компании с документами, подписями, версиями и контрагентами"""
+    sender = Company(name="ООО Отправитель", inn="7700000001")
+    receiver = Company(name="ООО Получатель", inn="7700000002")
+    db_session.add_all([sender, receiver])
+    db_session.flush()
+    user = User(
+        email="registry@example.com",
+        hashed_password="-",
+        full_name="Реестр",
+        role=UserRole.ADMIN,
+        company_id=sender.id,
+    )
+    db_session.add(user)
+    db_session.flush()
+
+    started = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    statuses = list(DocumentStatus)
+    types = list(DocumentType)
+    document_ids = db_session.execute(
+        insert(Document).returning(Document.id),
+        [
+            {
+                "number": f"Д-{index}",
+                # index // 2: у входящих (нечётных) и исходящих все типы и статусы
+                "document_type": types[index // 2 % len(types)],
+                "status": statuses[index // 2 % len(statuses)],
+                "sender_company_id": sender.id if index % 2 else receiver.id,
+                "receiver_company_id": receiver.id if index % 2 else None,
+                "created_at": started + timedelta(minutes=index),
+            }
+            for index in range(DOCUMENTS)
+        ],
+    ).scalars().all()
+    db_session.execute(
+        insert(Signature),
+        [{"document_id": document_id, "signer_id": user.id} for document_id in document_ids],
+    )
+    db_session.execute(
+        insert(DocumentVersion),
+        [
+            {"document_id": document_id, "version_number": 1, "file_path": f"v/{document_id}", "created_by": user.id}
+            for document_id in document_ids
+        ],
+    )
+    db_session.execute(
+        insert(Partner),
+        [
+            {
+                "company_id": sender.id if index % 2 else receiver.id,
+                "partner_name": f"Контрагент {index}",
+                "partner_inn": f"{index:012d}",
+            }
+            for index in range(DOCUMENTS)
+        ],
+    )
+    db_session.execute(text("ANALYZE"))
+    # Seq scan остаётся в плане, только если подходящего индекса нет
+    db_session.execute(text("SET LOCAL enable_seqscan = off"))
+    return {"sender": sender.id, "receiver": receiver.id, "document": document_ids[-1]}
+
+
+def _index_scans(node) -> list:
+    """Индексы, по которым план читает таблицы реестров"""
+    found = []
+    if node.get("Index Name"):
+        found.append(node["Index Name"])
+    for child in node.get("Plans", []):
+        found.extend(_index_scans(child))
+    return found
+
+
+def _explain(session, query) -> dict:
+    sql = query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    plan = session.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def _page(query, model, limit=50):
+    # Как app.pagination.paginate: (created_at, id) desc
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+
+# Запрос реестра и индекс из 0002/0009, который он должен использовать
+REGISTRY_QUERIES = {
+    "outgoing": (
+        "ix_documents_sender_created",
+        lambda ids: _page(select(Document).where(Document.sender_company_id == ids["sender"]), Document),
+    ),
+    "outgoing_status": (
+        "ix_documents_sender_status_created",
+        lambda ids: _page(
+            select(Document).where(
+                Document.sender_company_id == ids["sender"], Document.status == DocumentStatus.SIGNED
+            ),
+            Document,
+        ),
+    ),
+    "outgoing_type": (
+        "ix_documents_sender_type_created",
+        lambda ids: _page(
+            select(Document).where(
+                Document.sender_company_id == ids["sender"], Document.document_type == DocumentType.INVOICE
+            ),
+            Document,
+        ),
+    ),
+    "incoming": (
+        "ix_documents_receiver_created",
+        lambda ids: _page(select(Document).where(Document.receiver_company_id == ids["receiver"]), Document),
+    ),
+    "incoming_status": (
+        "ix_documents_receiver_status_created",
+        lambda ids: _page(
+            select(Document).where(
+                Document.receiver_company_id == ids["receiver"], Document.status == DocumentStatus.SIGNED
+            ),
+            Document,
+        ),
+    ),
+    "incoming_type": (
+        "ix_documents_receiver_type_created",
+        lambda ids: _page(
+            select(Document).where(
+                Document.receiver_company_id == ids["receiver"], Document.document_type == DocumentType.INVOICE
+            ),
+            Document,
+        ),
+    ),
+    "signatures": (
+        "ix_signatures_document_signed",
+        lambda ids: select(Signature).where(Signature.document_id == ids["document"]).order_by(Signature.signed_at),
+    ),
+    "versions": (
+        "ix_document_versions_document",
+        lambda ids: select(DocumentVersion)
+        .where(DocumentVersion.document_id == ids["document"])
+        .order_by(DocumentVersion.version_number.desc()),
+    ),
+    "partners": (
+        "ix_partners_company_created",
+        lambda ids: _page(select(Partner).where(Partner.company_id == ids["sender"]), Partner),
+    ),
+}
+
+
+@pytest.mark.parametrize("name", sorted(REGISTRY_QUERIES))
+def test_registry_query_uses_index(db_session, registry, name):
+    expected, query = REGISTRY_QUERIES[name]
+    plan = _explain(db_session, query(registry))
+    # Полный просмотр по pkey с Filter тоже обходит seq scan, поэтому
+    # проверяется именно составной индекс реестра
+    assert expected in _index_scans(plan), f"{name}: нет {expected} в плане\n{json.dumps(plan, indent=2)}"
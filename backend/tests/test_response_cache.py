@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from app import response_cache
+from app.response_cache import MemoryResponseCache, cached_response, store_response
+
+KEY = "response:document:1"
+
+
+def _request() -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = MemoryResponseCache(ttl=60, maxsize=2)
+    monkeypatch.setattr(response_cache, "response_cache", cache)
+    return cache
+
+
+def test_response_stored_after_miss(cache):
+    async def scenario():
+        request = _request()
+        assert await cached_response(request, KEY, "1:") is None
+        await store_response(request, KEY, "1:", '"v1"', b'{"status": "draft"}')
+        return await cached_response(_request(), KEY, "1:")
+
+    cached = asyncio.run(scenario())
+
+    assert cached.body == b'{"status": "draft"}'
+
+
+def test_stale_response_not_stored_after_invalidation(cache):
+    async def scenario():
+        request = _request()
+        assert await cached_response(request, KEY, "1:") is None
+        # Пока запрос читал БД, документ изменили и ключ сбросили после commit
+        cache.delete_nowait([KEY])
+        await store_response(request, KEY, "1:", '"v1"', b'{"status": "draft"}')
+        return await cached_response(_request(), KEY, "1:")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_evicted_generation_still_rejects_stale_response(cache):
+    async def scenario():
+        request = _request()
+        assert await cached_response(request, KEY, "1:") is None
+        cache.delete_nowait([KEY])
+        # Поколение KEY вытеснено сбросами других ключей (maxsize=2)
+        cache.delete_nowait(["response:document:2", "response:document:3"])
+        await store_response(request, KEY, "1:", '"v1"', b'{"status": "draft"}')
+        return await cached_response(_request(), KEY, "1:")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_redis_invalidation_task_is_kept_until_done():
+    pytest.importorskip("redis")
+
+    async def scenario():
+        # Redis недоступен: ошибка сброса логируется, а не теряется вместе с задачей
+        cache = response_cache.RedisResponseCache("redis://127.0.0.1:1/0", ttl=60)
+        cache.delete_nowait([KEY])
+        pending = len(response_cache._pending_invalidations)
+        await response_cache.wait_invalidations()
+        return pending, len(response_cache._pending_invalidations)
+
+    assert asyncio.run(scenario()) == (1, 0)